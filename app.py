@@ -1,29 +1,66 @@
 import os
 import uuid
+import base64
 import re
 import json
-import hashlib
-import time
+import mimetypes
+import xxhash
+import orjson
 import secrets
+import shutil
+import time
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
-from flask import Flask, request, redirect, jsonify, session, Response, abort, make_response, send_from_directory
+import threading
+import itertools
+import queue
+import atexit
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from flask.json.provider import DefaultJSONProvider
+from flask import Flask, request, redirect, jsonify, session, g, Response, abort, make_response, send_from_directory, stream_with_context
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from io import BytesIO
+from urllib.parse import urlencode
 from pathlib import Path
+from cachetools import LRUCache, TTLCache
 from flask_session import Session
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from google.oauth2 import service_account
-from authlib.integrations.flask_client import OAuth
 from werkzeug.middleware.proxy_fix import ProxyFix # New Import
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import NotFound
 
 app = Flask(__name__)
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """jsonify/request.get_json backed by orjson.
+
+    Datetimes are passed through to Flask's default() so they keep the HTTP-date format.
+    Keys are not sorted.
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option), mimetype=self.mimetype
+        )
+
+
+app.json = ORJSONProvider(app)
+
 # --- CRITICAL FIX START: Tell Flask to trust the proxy headers (Apache) ---
 # This ensures url_for(_external=True) uses the public domain and protocol
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_host=1, x_proto=1)
@@ -55,6 +92,8 @@ FRONTEND_ORIGINS = [
     ).split(',')
     if origin.strip()
 ]
+FRONTEND_ORIGINS_SET = frozenset(FRONTEND_ORIGINS)
+DEFAULT_FRONTEND_ORIGIN = FRONTEND_ORIGINS[0] if FRONTEND_ORIGINS else None
 
 # Default admin bootstrap values (hoisted before use)
 INIT_ADMIN_EMAIL = os.getenv('INIT_ADMIN_EMAIL', 'admin')
@@ -62,61 +101,161 @@ INIT_ADMIN_PASSWORD = os.getenv('INIT_ADMIN_PASSWORD')
 
 # File upload configuration
 UPLOAD_FOLDER = os.path.join(app.root_path, 'static', 'documents')
-ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'xlsx', 'xls'}
+GLOBAL_APPS_DIR = os.path.join(app.root_path, 'static', 'global_apps')  # district logos (reuses existing volume)
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'doc', 'docx', 'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp', 'xlsx', 'xls'})
+ALLOWED_SUFFIXES = tuple('.' + ext for ext in ALLOWED_EXTENSIONS)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload directory exists
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024  # 1MB reads/writes when saving uploads
+# Optional invoice download offload to the front-end web server (both off by default):
+# INVOICE_X_SENDFILE=1 for Apache mod_xsendfile (XSendFilePath covering UPLOAD_FOLDER), or
+# INVOICE_ACCEL_REDIRECT_PREFIX for an nginx `internal` location aliased to UPLOAD_FOLDER
+# (e.g. /_protected_invoices/). Deliberately not Flask's USE_X_SENDFILE, which would also
+# hand off the SPA and /static responses.
+INVOICE_X_SENDFILE = os.getenv('INVOICE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+INVOICE_ACCEL_REDIRECT_PREFIX = os.getenv('INVOICE_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+# Built React frontend; Vite content-hashes everything under assets/, so it can be cached for a year
+CLIENT_DIR = os.path.join(app.root_path, 'client')
+CLIENT_ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Proxied images are cached as blobs in a dedicated SQLite database
+IMAGE_CACHE_DB_PATH = os.getenv('IMAGE_CACHE_DB_PATH', os.path.join(app.root_path, 'data', 'image_cache.db'))
+
+# Ensure upload and cache directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(GLOBAL_APPS_DIR, exist_ok=True)
+os.makedirs(os.path.dirname(IMAGE_CACHE_DB_PATH), exist_ok=True)
 
 # Initialize extensions
 Session(app)
 
 # Cache configuration
 CACHE_DURATION = 86400  # 24 hours in seconds
-CACHE = {}
+IMAGE_STREAM_CHUNK_SIZE = 64 * 1024
+IMAGE_CACHE_MAX_BYTES = 512 * 1024  # larger images are streamed but not cached
+# The proxy is public, so the on-disk cache is bounded: at most IMAGE_CACHE_MAX_ROWS images
+# (x IMAGE_CACHE_MAX_BYTES = 512MB worst case), pruned every IMAGE_CACHE_PRUNE_EVERY inserts
+IMAGE_CACHE_MAX_ROWS = 1024
+IMAGE_CACHE_PRUNE_EVERY = 64
+# District roles, shared by admin_required/is_admin_email/auth_me; role changes pop the key
+ROLE_CACHE_TTL = 60
+ROLE_CACHE = TTLCache(maxsize=4096, ttl=ROLE_CACHE_TTL)
+ROLE_CACHE_LOCK = threading.Lock()
+_ROLE_MISSING = object()
+# District slug -> id. Slugs never change and districts are never deleted, so only
+# hits are cached and nothing needs invalidating; the TTL just bounds staleness
+DISTRICT_ID_CACHE = TTLCache(maxsize=1024, ttl=300)
+DISTRICT_ID_CACHE_LOCK = threading.Lock()
+# (cache_versions counter, serialized body) for api_admin_apps
+_admin_apps_cache = (None, None)
 
 # Admin allowlist (env-driven; comma-separated emails/usernames)
-ADMIN_EMAILS = {
-    email.strip().lower()
-    for email in os.getenv('ADMIN_EMAILS', '').split(',')
-    if email.strip()
-}
+_admin_emails = [email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',')]
 if INIT_ADMIN_EMAIL:
-    ADMIN_EMAILS.add(INIT_ADMIN_EMAIL.strip().lower())
+    _admin_emails.append(INIT_ADMIN_EMAIL.strip().lower())
+ADMIN_EMAILS = frozenset(email for email in _admin_emails if email)
 
 # CSRF Protection
+# Asset and proxy requests never read the token; minting one there would create a
+# filesystem session for every cookie-less visitor.
+CSRF_EXEMPT_ENDPOINTS = frozenset({'static', 'serve_frontend', 'image_proxy'})
+
+# New-session tokens come from a pool that a background thread refills with one
+# batched urandom read, keeping the RNG syscall off the request path.
+CSRF_TOKEN_BYTES = 32
+CSRF_POOL_BATCH = 256
+CSRF_POOL_LOW_WATER = 64
+_csrf_token_pool = deque(maxlen=1024)
+_csrf_pool_refill = threading.Event()
+_csrf_pool_lock = threading.Lock()
+_csrf_pool_thread = None
+
+
+def _fill_csrf_token_pool():
+    """Background loop: top up the token pool whenever a refill is requested."""
+    while True:
+        _csrf_pool_refill.wait()
+        _csrf_pool_refill.clear()
+        raw = os.urandom(CSRF_TOKEN_BYTES * CSRF_POOL_BATCH)
+        # Same encoding as secrets.token_urlsafe(CSRF_TOKEN_BYTES)
+        _csrf_token_pool.extend(
+            base64.urlsafe_b64encode(raw[i:i + CSRF_TOKEN_BYTES]).rstrip(b'=').decode('ascii')
+            for i in range(0, len(raw), CSRF_TOKEN_BYTES)
+        )
+
+
+def _request_csrf_pool_refill():
+    """Wake the refill thread, starting it on first use in this process."""
+    global _csrf_pool_thread
+    if _csrf_pool_thread is None:
+        with _csrf_pool_lock:
+            if _csrf_pool_thread is None:
+                _csrf_pool_thread = threading.Thread(
+                    target=_fill_csrf_token_pool, name='csrf-token-pool', daemon=True
+                )
+                _csrf_pool_thread.start()
+    _csrf_pool_refill.set()
+
+
+def _reset_csrf_token_pool():
+    """After fork: never hand out tokens pregenerated by the parent; restart the thread lazily."""
+    global _csrf_pool_thread, _csrf_pool_refill, _csrf_pool_lock
+    _csrf_token_pool.clear()
+    _csrf_pool_refill = threading.Event()
+    _csrf_pool_lock = threading.Lock()
+    _csrf_pool_thread = None
+
+os.register_at_fork(after_in_child=_reset_csrf_token_pool)
+
+
+def new_csrf_token():
+    """Take a token from the pool, generating one inline if the pool is empty."""
+    try:
+        token = _csrf_token_pool.popleft()
+    except IndexError:
+        token = secrets.token_urlsafe(CSRF_TOKEN_BYTES)
+    if len(_csrf_token_pool) < CSRF_POOL_LOW_WATER:
+        _request_csrf_pool_refill()
+    return token
+
+
 @app.before_request
 def ensure_csrf_token():
     """Generate a CSRF token per session if missing"""
-    if 'csrf_token' not in session:
-        session['csrf_token'] = secrets.token_urlsafe(32)
+    if request.endpoint in CSRF_EXEMPT_ENDPOINTS:
+        return
+    token = session.get('csrf_token')
+    if not token:
+        token = session['csrf_token'] = new_csrf_token()
+    # Cached for validate_csrf so it doesn't go back to the session backend
+    g.csrf_token = token
 
 def validate_csrf(token):
     """Validate CSRF token"""
-    if not token or 'csrf_token' not in session:
-        return False
-    try:
-        return secrets.compare_digest(session['csrf_token'], token)
-    except Exception:
+    expected = getattr(g, 'csrf_token', None)
+    if not expected or not token or not isinstance(token, str):
         return False
+    # Compare bytes: compare_digest rejects non-ASCII str outright
+    return secrets.compare_digest(expected.encode(), token.encode())
 
 # Allow simple CORS for API endpoints (dev convenience)
 @app.after_request
 def add_cors_headers(response):
+    if not request.path.startswith('/api/'):
+        return response
     try:
-        if request.path.startswith('/api/'):
-            origin = request.headers.get('Origin')
-            if origin in FRONTEND_ORIGINS:
-                response.headers['Access-Control-Allow-Origin'] = origin
-            elif FRONTEND_ORIGINS:
-                response.headers['Access-Control-Allow-Origin'] = FRONTEND_ORIGINS[0]
-            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-            response.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS'
-            response.headers['Access-Control-Allow-Credentials'] = 'true'
-            response.headers['Vary'] = 'Origin'
-            if request.method == 'OPTIONS':
-                response.status_code = 204
+        origin = request.headers.get('Origin')
+        if origin in FRONTEND_ORIGINS_SET:
+            response.headers['Access-Control-Allow-Origin'] = origin
+        elif DEFAULT_FRONTEND_ORIGIN:
+            response.headers['Access-Control-Allow-Origin'] = DEFAULT_FRONTEND_ORIGIN
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS'
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Vary'] = 'Origin'
+        if request.method == 'OPTIONS':
+            response.status_code = 204
     except Exception:
         pass
     return response
@@ -128,37 +267,101 @@ def handle_api_options(any_path):
     resp = make_response('', 204)
     return add_cors_headers(resp)
 
-# Cache decorator with TTL
-def cache_ttl(ttl_seconds):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            key = hashlib.md5(str(args[1]).encode('utf-8')).hexdigest()
-            if key in CACHE:
-                cached_time, data = CACHE[key]
-                if time.time() - cached_time < ttl_seconds:
-                    return data
-            
-            result = func(*args, **kwargs)
-            CACHE[key] = (time.time(), result)
-            return result
-        return wrapper
-    return decorator
+# Shared HTTP session for the image proxy: keep-alive connections are pooled per
+# upstream host, so repeated thumbnails from one CDN reuse a single TLS handshake.
+IMAGE_HTTP = requests.Session()
+IMAGE_HTTP.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+_image_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.1),
+)
+IMAGE_HTTP.mount('http://', _image_http_adapter)
+IMAGE_HTTP.mount('https://', _image_http_adapter)
 
-@cache_ttl(ttl_seconds=CACHE_DURATION)
 def fetch_image(url):
-    """Fetch image with timeout and retry logic"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
+    """Open a streaming image request with timeout and retry logic.
+
+    Returns the response or None on failure; the caller is responsible for
+    consuming and closing the returned response.
+    """
     try:
-        response = requests.get(url, stream=True, headers=headers, timeout=5)
+        response = IMAGE_HTTP.get(url, stream=True, timeout=5)
         response.raise_for_status()
-        return response.content, response.headers.get('content-type')
+        return response
     except requests.exceptions.RequestException as e:
         app.logger.error(f"Error fetching image {url}: {str(e)}")
-        return None, None
+        return None
+
+
+_image_cache_local = threading.local()
+
+def get_image_cache_connection():
+    """Return this thread's connection to the image cache database, creating it on first use."""
+    conn = getattr(_image_cache_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(IMAGE_CACHE_DB_PATH)
+        # page_size only takes effect before the first table is created
+        conn.execute('PRAGMA page_size=8192')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA mmap_size=268435456')
+        conn.execute(
+            '''CREATE TABLE IF NOT EXISTS img (
+                k BLOB PRIMARY KEY,
+                ct TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at INTEGER NOT NULL
+            ) WITHOUT ROWID'''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS img_fetched_at ON img (fetched_at)')
+        conn.commit()
+        _image_cache_local.conn = conn
+    return conn
+
+_image_cache_inserts = itertools.count(1)
+
+def prune_image_cache(conn):
+    """Drop expired images, then the oldest ones beyond IMAGE_CACHE_MAX_ROWS (freed pages are reused)."""
+    conn.execute('DELETE FROM img WHERE fetched_at <= ?', (int(time.time()) - CACHE_DURATION,))
+    conn.execute(
+        'DELETE FROM img WHERE k IN (SELECT k FROM img ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)',
+        (IMAGE_CACHE_MAX_ROWS,),
+    )
+
+def store_cached_image(cache_key, content_type, image_data):
+    """Insert or refresh an image in the cache database, pruning it periodically."""
+    conn = get_image_cache_connection()
+    conn.execute(
+        'INSERT OR REPLACE INTO img (k, ct, body, fetched_at) VALUES (?, ?, ?, ?)',
+        (cache_key, content_type, image_data, int(time.time())),
+    )
+    if next(_image_cache_inserts) % IMAGE_CACHE_PRUNE_EVERY == 0:
+        prune_image_cache(conn)
+    conn.commit()
+
+
+def stream_and_cache_image(upstream, cache_key, content_type):
+    """Yield the upstream body in chunks, caching it once complete if it is a small enough image."""
+    buffer = BytesIO() if content_type.startswith('image/') else None
+    try:
+        for chunk in upstream.iter_content(IMAGE_STREAM_CHUNK_SIZE):
+            if buffer is not None:
+                buffer.write(chunk)
+                if buffer.tell() > IMAGE_CACHE_MAX_BYTES:
+                    buffer = None
+            yield chunk
+    finally:
+        upstream.close()
+
+    # Only reached when the whole body was sent (not on client disconnect)
+    if buffer is not None and buffer.tell():
+        try:
+            store_cached_image(cache_key, content_type, buffer.getvalue())
+        except Exception as e:
+            app.logger.error(f"Error caching proxied image: {str(e)}")
 
 # Image proxy route to handle CORS issues with caching
 @app.route('/image-proxy')
@@ -169,29 +372,38 @@ def image_proxy():
         return 'URL parameter is required', 400
     
     try:
-        # Try to get from cache first
-        cache_key = hashlib.md5(url.encode('utf-8')).hexdigest()
-        if cache_key in CACHE:
-            cached_time, (image_data, content_type) = CACHE[cache_key]
-            if time.time() - cached_time < CACHE_DURATION:
-                return Response(image_data, content_type=content_type)
-        
-        # If not in cache or expired, fetch and cache
-        image_data, content_type = fetch_image(url)
+        # Try to get from the image cache database first
+        cache_key = xxhash.xxh3_64_digest(url.encode('utf-8'))
+        conn = get_image_cache_connection()
+        row = conn.execute(
+            'SELECT ct, body, fetched_at FROM img WHERE k = ? AND fetched_at > ?',
+            (cache_key, int(time.time()) - CACHE_DURATION),
+        ).fetchone()
         
-        if not image_data or not content_type:
+        if row:
+            # Return the cached image, honouring conditional and Range requests
+            content_type, image_data, fetched_at = row
+            response = Response(image_data, content_type=content_type)
+            response.last_modified = fetched_at
+            response.cache_control.max_age = CACHE_DURATION
+            return response.make_conditional(request, accept_ranges=True, complete_length=len(image_data))
+        
+        # If not in cache or expired, stream from upstream and cache on completion
+        upstream = fetch_image(url)
+        content_type = upstream.headers.get('content-type') if upstream is not None else None
+        if not content_type:
+            if upstream is not None:
+                upstream.close()
             return 'Error loading image', 500
-            
-        # Cache the result
-        CACHE[cache_key] = (time.time(), (image_data, content_type))
         
-        # Return the image
-        return Response(image_data, content_type=content_type)
+        return Response(
+            stream_with_context(stream_and_cache_image(upstream, cache_key, content_type)),
+            content_type=content_type,
+        )
         
     except Exception as e:
         app.logger.error(f"Error in image proxy: {str(e)}")
         return 'Error loading image', 500
-oauth = OAuth(app)
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -208,10 +420,55 @@ DISTRICT_NAME = os.getenv('DISTRICT_NAME', 'Default District')
 DISTRICT_CONTACT_EMAIL = os.getenv('DISTRICT_CONTACT_EMAIL', 'admin@example.com')
 
 
+# Password hashing: Argon2id, defaulting to the OWASP baseline cost (19 MiB, 2 passes),
+# ~25ms per hash versus ~100ms+ for Werkzeug's scrypt/pbkdf2 defaults. The cost can be
+# tuned per deployment; hashes made with other parameters (including Werkzeug hashes
+# from before the switch) still verify and are upgraded on the next login.
+PASSWORD_HASHER = PasswordHasher(
+    time_cost=int(os.getenv('ARGON2_TIME_COST', '2')),
+    memory_cost=int(os.getenv('ARGON2_MEMORY_COST', '19456')),  # KiB
+    parallelism=int(os.getenv('ARGON2_PARALLELISM', '1')),
+)
+
+
+def hash_password(password):
+    """Hash a password with Argon2id."""
+    return PASSWORD_HASHER.hash(password)
+
+
+def verify_password(password_hash, password):
+    """Check a password against an Argon2 hash or a legacy Werkzeug hash."""
+    if not password_hash:
+        return False
+    if password_hash.startswith('$argon2'):
+        try:
+            return PASSWORD_HASHER.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(password_hash, password)
+
+
+# Stored for SSO-only accounts: not a valid hash of anything, so verify_password always fails
+UNUSABLE_PASSWORD_HASH = '!'
+
+
+# A real Argon2 hash to verify against when there is no usable one, so failures cost the
+# same. Computed at import (once in the gunicorn master with preload_app) so no login
+# request ever pays for creating it.
+_DUMMY_HASH = hash_password(secrets.token_urlsafe(16))
+
+
+def password_needs_rehash(password_hash):
+    """True if the hash is a legacy Werkzeug hash or uses outdated Argon2 parameters."""
+    if not password_hash.startswith('$argon2'):
+        return True
+    return PASSWORD_HASHER.check_needs_rehash(password_hash)
+
+
 # File upload helper functions
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
 
 def save_uploaded_file(file, prefix='doc', include_static_prefix=True):
     """Save uploaded file and return the path
@@ -223,11 +480,13 @@ def save_uploaded_file(file, prefix='doc', include_static_prefix=True):
                               If False, returns documents/filename (for use with templates that add /static/)
     """
     if file and allowed_file(file.filename):
-        # Create a unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = f"{prefix}_{uuid.uuid4().hex[:8]}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        file.save(filepath)
+        # Create a unique filename (48 random bits; urlsafe chars survive secure_filename)
+        unique_filename = f"{prefix}_{secrets.token_urlsafe(6)}_{secure_filename(file.filename)}"
+        filepath = f"{UPLOAD_FOLDER}/{unique_filename}"
+        # O_EXCL: never silently overwrite an existing upload on a name collision
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, UPLOAD_COPY_BUFFER_SIZE)
         # Return path with or without 'static' prefix depending on usage
         if include_static_prefix:
             return f"/static/documents/{unique_filename}"
@@ -262,21 +521,32 @@ def is_google_drive_link(url):
 
 _ACTIVITY_LOG_TABLE_READY = False
 
+# Postgres -> SQLite rewrites: %s placeholders become ?, ILIKE becomes LIKE
+# (case-insensitive by default in SQLite for ASCII), TRUE/FALSE become 1/0.
+# Quoted literals/identifiers are matched first so their contents are left alone.
+_SQL_REWRITES = {'%s': '?', 'ILIKE': 'LIKE', 'TRUE': '1', 'FALSE': '0'}
+_SQL_REWRITE_RE = re.compile(r"""'[^']*'|"[^"]*"|%s|\b(?:ILIKE|TRUE|FALSE)\b""")
+
+
+@lru_cache(maxsize=4096)
+def translate_sql(query):
+    """Rewrite a Postgres-flavoured query for SQLite (cached per query string)."""
+    return _SQL_REWRITE_RE.sub(lambda m: _SQL_REWRITES.get(m.group(0), m.group(0)), query)
+
+
 class SQLiteCursorWrapper:
     def __init__(self, cursor):
         self.cursor = cursor
         
     def execute(self, query, params=None):
         if query:
-            # Replace Postgres %s placeholders with SQLite ?
-            query = query.replace('%s', '?')
-            # Replace Postgres ILIKE with SQLite LIKE (case-insensitive by default in SQLite for ASCII)
-            query = query.replace(' ILIKE ', ' LIKE ')
-            # Handle TRUE/FALSE literals in queries
-            query = query.replace('TRUE', '1').replace('FALSE', '0')
+            query = translate_sql(query)
             
         return self.cursor.execute(query, params or ())
 
+    def executemany(self, query, seq_of_params):
+        return self.cursor.executemany(translate_sql(query), seq_of_params)
+
     def fetchone(self):
         return self.cursor.fetchone()
 
@@ -315,74 +585,158 @@ class SQLiteConnectionWrapper:
         return self.conn.rollback()
         
     def close(self):
-        return self.conn.close()
+        # The underlying connection is pooled per thread; only discard uncommitted work
+        if self.conn.in_transaction:
+            self.conn.rollback()
 
 # -----------------------
 # Database Helper Functions
 # -----------------------
+# Per-connection tuning. journal_mode=WAL is persistent, so init_db sets it once;
+# synchronous=NORMAL is durable under WAL and avoids an fsync on every commit.
+SQLITE_CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-16384',
+)
+
+# sqlite3 keeps compiled statements per connection (LRU, default 128). app.py has
+# ~108 execute() call sites (about 15 of them init_db DDL), and a smoke run over the main
+# API routes prepares 84 distinct statements after translate_sql. That fits under 128 with
+# little slack, so 256 is headroom for new queries rather than a measured need.
+SQLITE_CACHED_STATEMENTS = 256
+
+_db_local = threading.local()
+
 def get_db_connection():
-    """Establish a SQLite connection (PostgreSQL disabled)."""
-    conn = sqlite3.connect(SQLITE_DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Return this thread's SQLite connection (PostgreSQL disabled), opening it on first use."""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(SQLITE_DB_PATH, cached_statements=SQLITE_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _db_local.conn = conn
     return SQLiteConnectionWrapper(conn)
 
+
+def _reset_db_connections():
+    """After fork: SQLite connections must not cross fork(), so abandon the parent's
+    (without closing them, which could drop the parent's file locks) and reopen lazily."""
+    global _db_local, _image_cache_local
+    _db_local = threading.local()
+    _image_cache_local = threading.local()
+
+os.register_at_fork(after_in_child=_reset_db_connections)
+
+
+@app.teardown_appcontext
+def reset_db_connection(exc):
+    """Roll back anything a failed request left open on this thread's connection."""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def is_unique_violation(exc) -> bool:
+    """True if a DB error is a UNIQUE/primary-key conflict (SQLite error name or Postgres SQLSTATE 23505)."""
+    return (getattr(exc, 'sqlite_errorname', None) in ('SQLITE_CONSTRAINT_UNIQUE', 'SQLITE_CONSTRAINT_PRIMARYKEY')
+            or getattr(exc, 'pgcode', None) == '23505')
+
+
+# Bump whenever a schema helper changes so init_db re-runs them on existing databases
+SCHEMA_VERSION = 6
+
+
+@contextmanager
+def schema_cursor(cursor=None):
+    """Yield the caller's cursor as-is, or a fresh one whose work is committed on exit.
+
+    Lets the ensure_* helpers run standalone or inside init_db's single transaction.
+    """
+    if cursor is not None:
+        yield cursor
+        return
+    conn = get_db_connection()
+    own_cursor = conn.cursor()
+    try:
+        yield own_cursor
+        conn.commit()
+    finally:
+        own_cursor.close()
+        conn.close()
+
+
 def init_db():
-    """Initializes the database schema (SQLite only)."""
+    """Initializes the database schema (SQLite only).
+
+    All DDL runs in one transaction; PRAGMA user_version records SCHEMA_VERSION so
+    later calls skip straight to seeding the default district and admin.
+    """
+    global _ACTIVITY_LOG_TABLE_READY
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS apps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            unique_id TEXT NOT NULL,
-            notes TEXT,
-            company TEXT,
-            privacy_link TEXT NOT NULL,
-            soppa_compliant TEXT CHECK(soppa_compliant IN (
-                'Compliant', 'Staff use only', 'Not applicable', 'Unknown',
-                'Policies are SOPPA compliant', 'Not fully SOPPA compliant',
-                'Noncompliant', 'Parent consent required'
-            )),
-            otherdocs TEXT,
-            invoices TEXT,
-            status TEXT CHECK(status IN (
-                'Pending', 'Not Supported by District', 'Approved for Use',
-                'Use Alternate', 'Core Tool', 'Supplemental Tool', 'Reviewed & Denied'
-            )) NOT NULL,
-            tags TEXT,
-            product_visibility INTEGER CHECK(product_visibility IN (0, 1)) NOT NULL DEFAULT 1,
-            product_link TEXT
-        )
-    ''')
-
-    conn.commit()
-    cursor.close()
-    conn.close()
-    # Ensure audit log table exists as well
     try:
-        ensure_users_schema() # CRITICAL: Ensure users table exists for local auth
-        ensure_activity_log_schema()
-        ensure_app_requests_schema()
-        ensure_vendor_contacts_schema()
-        ensure_districts_schema()
-        migrate_districts_schema() # Ensure new columns are added
-        ensure_district_users_schema()
-        ensure_district_apps_schema()
-        ensure_default_district()
-        ensure_default_admin()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA user_version')
+        schema_current = cursor.fetchone()[0] >= SCHEMA_VERSION
+        cursor.execute('BEGIN IMMEDIATE')
+        if not schema_current:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS apps (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                unique_id TEXT NOT NULL,
+                notes TEXT,
+                company TEXT,
+                privacy_link TEXT NOT NULL,
+                soppa_compliant TEXT CHECK(soppa_compliant IN (
+                    'Compliant', 'Staff use only', 'Not applicable', 'Unknown',
+                    'Policies are SOPPA compliant', 'Not fully SOPPA compliant',
+                    'Noncompliant', 'Parent consent required'
+                )),
+                otherdocs TEXT,
+                invoices TEXT,
+                status TEXT CHECK(status IN (
+                    'Pending', 'Not Supported by District', 'Approved for Use',
+                    'Use Alternate', 'Core Tool', 'Supplemental Tool', 'Reviewed & Denied'
+                )) NOT NULL,
+                tags TEXT,
+                product_visibility INTEGER CHECK(product_visibility IN (0, 1)) NOT NULL DEFAULT 1,
+                product_link TEXT
+            )
+            ''')
+            ensure_users_schema(cursor=cursor) # CRITICAL: Ensure users table exists for local auth
+            ensure_activity_log_schema(force=True, cursor=cursor)
+            ensure_app_requests_schema(cursor=cursor)
+            ensure_vendor_contacts_schema(cursor=cursor)
+            ensure_app_invoices_schema(cursor=cursor)
+            ensure_districts_schema(cursor=cursor)
+            migrate_districts_schema(cursor=cursor) # Ensure new columns are added
+            ensure_district_users_schema(cursor=cursor)
+            ensure_district_apps_schema(cursor=cursor)
+            ensure_cache_versions_schema(cursor=cursor)
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        ensure_default_district(cursor=cursor)
+        ensure_default_admin(cursor=cursor)
+        conn.commit()
+        _ACTIVITY_LOG_TABLE_READY = True
     except Exception as exc:
+        conn.rollback()
         app.logger.warning('Failed ensuring schema during init: %s', exc)
+    finally:
+        cursor.close()
+        conn.close()
 
 
-def ensure_activity_log_schema(force: bool = False):
+def ensure_activity_log_schema(force: bool = False, cursor=None):
     """Create the audit log table/index if they do not already exist."""
     global _ACTIVITY_LOG_TABLE_READY
     if _ACTIVITY_LOG_TABLE_READY and not force:
         return
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS app_activity_logs (
@@ -410,18 +764,12 @@ def ensure_activity_log_schema(force: bool = False):
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_app_activity_logs_created_at ON app_activity_logs (created_at DESC)
         ''')
-        conn.commit()
-        _ACTIVITY_LOG_TABLE_READY = True
-    finally:
-        cursor.close()
-        conn.close()
+    _ACTIVITY_LOG_TABLE_READY = True
 
 
-def ensure_app_requests_schema(force: bool = False):
+def ensure_app_requests_schema(force: bool = False, cursor=None):
     """Create the app_requests table used for staff-submitted app requests."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute(
                 '''CREATE TABLE IF NOT EXISTS app_requests (
@@ -449,17 +797,11 @@ def ensure_app_requests_schema(force: bool = False):
                 )'''
             )
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_requests_slug ON app_requests (district_slug)')
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def ensure_users_schema(force: bool = False):
+def ensure_users_schema(force: bool = False, cursor=None):
     """Create local user accounts table for password auth."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute(
                 '''CREATE TABLE IF NOT EXISTS users (
@@ -483,17 +825,11 @@ def ensure_users_schema(force: bool = False):
                 )'''
             )
         cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email)')
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def ensure_vendor_contacts_schema(force: bool = False):
+def ensure_vendor_contacts_schema(force: bool = False, cursor=None):
     """Create vendor contacts table and indexes if missing."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS vendor_contacts (
@@ -526,23 +862,66 @@ def ensure_vendor_contacts_schema(force: bool = False):
                     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
                 )'''
             )
+        # Narrow index for per-app contact counts (index-only COUNT in api_admin_apps)
         cursor.execute(
             'CREATE INDEX IF NOT EXISTS idx_vendor_contacts_app_id ON vendor_contacts (app_id)'
         )
         cursor.execute(
             'CREATE UNIQUE INDEX IF NOT EXISTS uq_vendor_contacts_app_email ON vendor_contacts (app_id, email)'
         )
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def ensure_districts_schema(force: bool = False):
+def ensure_app_invoices_schema(force: bool = False, cursor=None):
+    """Create the app_invoices table (one row per invoice file) and migrate apps.invoices into it."""
+    with schema_cursor(cursor) as cursor:
+        if USE_SQLITE:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS app_invoices (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    app_id INTEGER NOT NULL REFERENCES apps(id) ON DELETE CASCADE,
+                    path TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Foreign keys aren't enforced on these connections, so cascade by trigger
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_apps_delete_invoices
+                AFTER DELETE ON apps
+                BEGIN
+                    DELETE FROM app_invoices WHERE app_id = OLD.id;
+                END
+            ''')
+        else:
+            cursor.execute(
+                '''CREATE TABLE IF NOT EXISTS app_invoices (
+                    id SERIAL PRIMARY KEY,
+                    app_id INTEGER NOT NULL REFERENCES apps(id) ON DELETE CASCADE,
+                    path TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    uploaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )'''
+            )
+        # delete_invoice matches on (app_id, basename)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_app_invoices_app_filename ON app_invoices (app_id, filename)'
+        )
+
+        # Backfill from the legacy comma-separated column, then clear it so this runs once
+        cursor.execute("SELECT id, invoices FROM apps WHERE invoices IS NOT NULL AND invoices != ''")
+        for app_id, invoices in cursor.fetchall():
+            for path in (inv.strip() for inv in invoices.split(',')):
+                if path:
+                    cursor.execute(
+                        'INSERT INTO app_invoices (app_id, path, filename) VALUES (%s, %s, %s)',
+                        (app_id, path, Path(path).name),
+                    )
+        cursor.execute("UPDATE apps SET invoices = NULL WHERE invoices IS NOT NULL")
+
+
+def ensure_districts_schema(force: bool = False, cursor=None):
     """Create districts table and indexes if missing."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS districts (
@@ -596,16 +975,10 @@ def ensure_districts_schema(force: bool = False):
         cursor.execute(
             'CREATE INDEX IF NOT EXISTS idx_districts_slug ON districts (slug)'
         )
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
-def migrate_districts_schema():
+def migrate_districts_schema(cursor=None):
     """Add new columns to districts table if they don't exist."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         # Columns to ensure exist
         columns = [
             'logo_url', 'primary_color', 'accent_color', 'allowed_domain',
@@ -613,26 +986,21 @@ def migrate_districts_schema():
             'apple_client_id', 'apple_team_id', 'apple_key_id', 'apple_private_key',
             'microsoft_client_id', 'microsoft_tenant_id', 'microsoft_client_secret'
         ]
-        for col in columns:
-            try:
-                if USE_SQLITE:
+        if USE_SQLITE:
+            # SQLite doesn't support IF NOT EXISTS for ADD COLUMN; diff against the live table instead
+            cursor.execute("PRAGMA table_info(districts)")
+            existing = {row[1] for row in cursor.fetchall()}
+            for col in columns:
+                if col not in existing:
                     cursor.execute(f"ALTER TABLE districts ADD COLUMN {col} TEXT")
-                else:
-                    cursor.execute(f"ALTER TABLE districts ADD COLUMN IF NOT EXISTS {col} TEXT")
-                conn.commit()
-            except Exception:
-                # Ignore error if column exists (SQLite doesn't support IF NOT EXISTS for ADD COLUMN)
-                pass
-    finally:
-        cursor.close()
-        conn.close()
+        else:
+            for col in columns:
+                cursor.execute(f"ALTER TABLE districts ADD COLUMN IF NOT EXISTS {col} TEXT")
 
 
-def ensure_district_users_schema(force: bool = False):
+def ensure_district_users_schema(force: bool = False, cursor=None):
     """Create district_users table for user roles per district."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS district_users (
@@ -659,23 +1027,24 @@ def ensure_district_users_schema(force: bool = False):
                     UNIQUE(district_id, email)
                 )
             ''')
+        # Serves the users listing (district_id = ? ORDER BY LOWER(email)) in index order
+        # with no sort step; it also covers district_id lookups, replacing the old index.
         cursor.execute(
-            'CREATE INDEX IF NOT EXISTS idx_district_users_district_id ON district_users (district_id)'
+            'CREATE INDEX IF NOT EXISTS idx_district_users_district_email_lower '
+            'ON district_users (district_id, LOWER(email))'
         )
+        cursor.execute('DROP INDEX IF EXISTS idx_district_users_district_id')
+        # Covers get_user_role's lookup (email -> role) without touching the table rows;
+        # it also serves plain email lookups, so the old email-only index is redundant.
         cursor.execute(
-            'CREATE INDEX IF NOT EXISTS idx_district_users_email ON district_users (email)'
+            'CREATE INDEX IF NOT EXISTS idx_district_users_email_role ON district_users (email, role)'
         )
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
+        cursor.execute('DROP INDEX IF EXISTS idx_district_users_email')
 
 
-def ensure_district_apps_schema(force: bool = False):
+def ensure_district_apps_schema(force: bool = False, cursor=None):
     """Create district_apps table to scope apps per district."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    with schema_cursor(cursor) as cursor:
         if USE_SQLITE:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS district_apps (
@@ -701,110 +1070,196 @@ def ensure_district_apps_schema(force: bool = False):
         cursor.execute(
             'CREATE INDEX IF NOT EXISTS idx_district_apps_district_id ON district_apps (district_id)'
         )
-        conn.commit()
-    finally:
-        cursor.close()
-        conn.close()
 
 
-def ensure_default_district():
+# Tables whose writes invalidate a cached response, keyed by cache_versions.name
+CACHE_VERSION_SOURCES = {
+    'admin_apps': ('apps', 'vendor_contacts'),
+    'district_users': ('district_users', 'users', 'districts'),
+}
+
+
+def ensure_cache_versions_schema(force: bool = False, cursor=None):
+    """Create per-response change counters, bumped by triggers on the source tables.
+
+    Every worker process can then validate its cached copy with one primary-key read,
+    whichever process made the write. SQLite only; Postgres callers skip caching.
+    """
+    if not USE_SQLITE:
+        return
+    with schema_cursor(cursor) as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        ''')
+        for name, tables in CACHE_VERSION_SOURCES.items():
+            cursor.execute('INSERT OR IGNORE INTO cache_versions (name) VALUES (?)', (name,))
+            for table in tables:
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{name}_{table}_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE cache_versions SET version = version + 1 WHERE name = '{name}';
+                        END
+                    ''')
+
+
+def get_cache_version(cursor, name):
+    """Current change counter for a cached response, or None if it can't be tracked."""
+    if not USE_SQLITE:
+        return None
+    cursor.execute('SELECT version FROM cache_versions WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def ensure_default_district(cursor=None):
     """Ensure the single default district exists."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Check if any district exists
-        if USE_SQLITE:
-            cursor.execute("SELECT count(*) FROM districts")
-        else:
-            cursor.execute("SELECT count(*) FROM districts")
-        
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            app.logger.info(f"Creating default district: {DISTRICT_NAME}")
+        with schema_cursor(cursor) as cursor:
+            # Insert only if no district exists at all (setup may have created one
+            # with a custom slug); a single statement leaves no check-then-insert race
             slug = 'local' # Hardcode slug for single-tenant
-            if USE_SQLITE:
-                cursor.execute(
-                    "INSERT INTO districts (name, slug, contact_email, created_by_email) VALUES (?, ?, ?, ?)",
-                    (DISTRICT_NAME, slug, DISTRICT_CONTACT_EMAIL, 'system')
-                )
-            else:
-                cursor.execute(
-                    "INSERT INTO districts (name, slug, contact_email, created_by_email) VALUES (%s, %s, %s, %s)",
-                    (DISTRICT_NAME, slug, DISTRICT_CONTACT_EMAIL, 'system')
-                )
-            conn.commit()
+            cursor.execute(
+                """INSERT INTO districts (name, slug, contact_email, created_by_email)
+                   SELECT %s, %s, %s, %s WHERE NOT EXISTS (SELECT 1 FROM districts)""",
+                (DISTRICT_NAME, slug, DISTRICT_CONTACT_EMAIL, 'system')
+            )
+            if cursor.rowcount == 1:
+                app.logger.info(f"Created default district: {DISTRICT_NAME}")
     except Exception as e:
         app.logger.error(f"Error ensuring default district: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
-def ensure_default_admin():
+def ensure_default_admin(cursor=None):
     """Ensure the initial admin user exists."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Check if admin exists in users table
-        if USE_SQLITE:
-            cursor.execute("SELECT id FROM users WHERE email = ?", (INIT_ADMIN_EMAIL,))
-        else:
+        with schema_cursor(cursor) as cursor:
+            # Check if admin exists in users table (indexed lookup; avoids hashing on warm boots)
             cursor.execute("SELECT id FROM users WHERE email = %s", (INIT_ADMIN_EMAIL,))
+                
+            user = cursor.fetchone()
+            if user:
+                return
             
-        user = cursor.fetchone()
-        
-        if not user:
             if not INIT_ADMIN_PASSWORD:
                 app.logger.warning("INIT_ADMIN_PASSWORD is not set; skipping default admin creation")
                 return
             app.logger.info(f"Creating default admin: {INIT_ADMIN_EMAIL}")
-            password_hash = generate_password_hash(INIT_ADMIN_PASSWORD)
+            password_hash = hash_password(INIT_ADMIN_PASSWORD)
             
-            if USE_SQLITE:
-                cursor.execute(
-                    "INSERT INTO users (email, name, password_hash) VALUES (?, ?, ?)",
-                    (INIT_ADMIN_EMAIL, 'Super Admin', password_hash)
-                )
-            else:
-                cursor.execute(
-                    "INSERT INTO users (email, name, password_hash) VALUES (%s, %s, %s)",
-                    (INIT_ADMIN_EMAIL, 'Super Admin', password_hash)
-                )
-            conn.commit()
+            # ON CONFLICT: another worker booting concurrently may have just created it
+            cursor.execute(
+                "INSERT INTO users (email, name, password_hash) VALUES (%s, %s, %s) ON CONFLICT (email) DO NOTHING",
+                (INIT_ADMIN_EMAIL, 'Super Admin', password_hash)
+            )
             
             # Now assign admin role to the district
             # Get the district id
-            if USE_SQLITE:
-                cursor.execute("SELECT id FROM districts LIMIT 1")
-            else:
-                cursor.execute("SELECT id FROM districts LIMIT 1")
+            cursor.execute("SELECT id FROM districts LIMIT 1")
             district_id = cursor.fetchone()[0]
             
             # Add to district_users
-            try:
-                if USE_SQLITE:
-                    cursor.execute(
-                        "INSERT INTO district_users (district_id, email, role, name) VALUES (?, ?, 'admin', 'Super Admin')",
-                        (district_id, INIT_ADMIN_EMAIL)
-                    )
-                else:
-                    cursor.execute(
-                        "INSERT INTO district_users (district_id, email, role, name) VALUES (%s, %s, 'admin', 'Super Admin')",
-                        (district_id, INIT_ADMIN_EMAIL)
-                    )
-                conn.commit()
-            except Exception as e: 
-                app.logger.warning(f"Admin might already be in district_users: {e}")
+            cursor.execute(
+                "INSERT INTO district_users (district_id, email, role, name) VALUES (%s, %s, 'admin', 'Super Admin') ON CONFLICT (district_id, email) DO NOTHING",
+                (district_id, INIT_ADMIN_EMAIL)
+            )
 
     except Exception as e:
         app.logger.error(f"Error ensuring default admin: {e}")
+
+
+# Schema setup runs once per process here, so request handlers can assume every
+# table exists. init_db takes BEGIN IMMEDIATE, which serializes concurrent workers.
+init_db()
+
+
+# Activity rows are queued and written by one background thread in batches, so
+# write endpoints don't pay for an extra INSERT + commit on the request path.
+ACTIVITY_LOG_QUEUE_SIZE = 20000
+ACTIVITY_LOG_BATCH_SIZE = 500
+_ACTIVITY_LOG_STOP = object()
+_activity_log_queue = queue.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
+_activity_log_lock = threading.Lock()
+_activity_log_thread = None
+
+
+def _write_activity_log_batch(rows):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            """INSERT INTO app_activity_logs (action, app_id, app_name, user_email, details) VALUES (%s, %s, %s, %s, %s)""",
+            rows,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        app.logger.exception('Failed to record %d app activity log entries', len(rows))
     finally:
-        cursor.close()
+        cur.close()
         conn.close()
 
 
+def _activity_log_writer():
+    """Background loop: drain the queue, one executemany + commit per batch."""
+    try:
+        ensure_activity_log_schema()
+    except Exception:
+        app.logger.exception('Failed ensuring activity log schema')
+    stopping = False
+    while not stopping:
+        rows = [_activity_log_queue.get()]
+        while len(rows) < ACTIVITY_LOG_BATCH_SIZE:
+            try:
+                rows.append(_activity_log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if _ACTIVITY_LOG_STOP in rows:
+            stopping = True
+            rows = [row for row in rows if row is not _ACTIVITY_LOG_STOP]
+        if rows:
+            _write_activity_log_batch(rows)
+
+
+def _start_activity_log_writer():
+    """Start the writer thread on first use in this process."""
+    global _activity_log_thread
+    with _activity_log_lock:
+        if _activity_log_thread is None:
+            _activity_log_thread = threading.Thread(
+                target=_activity_log_writer, name='activity-log-writer', daemon=True
+            )
+            _activity_log_thread.start()
+
+
+@atexit.register
+def flush_activity_log():
+    """Write out anything still queued before the process exits."""
+    thread = _activity_log_thread
+    if thread is None or not thread.is_alive():
+        return
+    try:
+        _activity_log_queue.put(_ACTIVITY_LOG_STOP, timeout=1)
+    except queue.Full:
+        return
+    thread.join(timeout=5)
+
+
+def _reset_activity_log_writer():
+    """After fork: the parent's writer thread doesn't exist here, and neither do its queued rows."""
+    global _activity_log_queue, _activity_log_lock, _activity_log_thread
+    _activity_log_queue = queue.Queue(maxsize=ACTIVITY_LOG_QUEUE_SIZE)
+    _activity_log_lock = threading.Lock()
+    _activity_log_thread = None
+
+os.register_at_fork(after_in_child=_reset_activity_log_writer)
+
+
 def record_app_activity(action, app_id=None, app_name=None, user_email=None, details=None):
-    """Insert an app activity log entry. Non-blocking: logs failures are caught and emitted to the app logger.
+    """Queue an app activity log entry. Non-blocking: the row is written by a background thread.
 
     Args:
         action: 'create'|'update'|'delete'
@@ -818,17 +1273,12 @@ def record_app_activity(action, app_id=None, app_name=None, user_email=None, det
             app.logger.warning(f"Invalid activity action attempted: {action}")
             return
 
-        ensure_activity_log_schema()
-        conn = get_db_connection()
-        cur = conn.cursor()
+        if _activity_log_thread is None:
+            _start_activity_log_writer()
         details_json = json.dumps(details, default=str) if details is not None else None
-        cur.execute(
-            """INSERT INTO app_activity_logs (action, app_id, app_name, user_email, details) VALUES (%s, %s, %s, %s, %s)""",
-            (action, app_id, app_name, user_email, details_json),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
+        _activity_log_queue.put_nowait((action, app_id, app_name, user_email, details_json))
+    except queue.Full:
+        app.logger.warning('Activity log queue full; dropping %s entry for app %s', action, app_id)
     except Exception:
         app.logger.exception('Failed to record app activity log')
 
@@ -838,14 +1288,19 @@ def record_app_activity(action, app_id=None, app_name=None, user_email=None, det
 def serve_frontend(path):
     """Serve the React Frontend (SPA)."""
     # If the path points to a file in the 'client' directory (e.g. assets), serve it.
-    if path != "" and os.path.exists(os.path.join(app.root_path, 'client', path)):
-        return send_from_directory(os.path.join(app.root_path, 'client'), path)
+    # send_from_directory already stats the file, so a miss is just a NotFound.
+    if path != "":
+        try:
+            max_age = CLIENT_ASSET_MAX_AGE if path.startswith('assets/') else None
+            return send_from_directory(CLIENT_DIR, path, max_age=max_age)
+        except NotFound:
+            pass
     
     # Otherwise, fallback to index.html for client-side routing
-    if os.path.exists(os.path.join(app.root_path, 'client', 'index.html')):
-        return send_from_directory(os.path.join(app.root_path, 'client'), 'index.html')
-    
-    return "Frontend not found. Did you run the build?", 404
+    try:
+        return send_from_directory(CLIENT_DIR, 'index.html', max_age=0)
+    except NotFound:
+        return "Frontend not found. Did you run the build?", 404
 
 
 
@@ -872,35 +1327,24 @@ def register_user():
         if len(password) < 8:
             return jsonify({'error': 'Password must be at least 8 characters'}), 400
 
-        ensure_users_schema()
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        if USE_SQLITE:
-            cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-        else:
-            cursor.execute('SELECT id FROM users WHERE email = %s', (email,))
-        if cursor.fetchone():
-            return jsonify({'error': 'Account already exists'}), 409
-
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         display_name = name or email.split('@')[0]
 
-        if USE_SQLITE:
-            cursor.execute(
-                '''INSERT INTO users (email, name, password_hash)
-                   VALUES (?, ?, ?)''',
-                (email, display_name, password_hash),
-            )
-            user_id = cursor.lastrowid
-        else:
-            cursor.execute(
-                '''INSERT INTO users (email, name, password_hash)
-                   VALUES (%s, %s, %s)
-                   RETURNING id''',
-                (email, display_name, password_hash),
-            )
-            user_id = cursor.fetchone()[0]
+        # One statement: the unique email index decides duplicates, with no check-then-insert race
+        cursor.execute(
+            '''INSERT INTO users (email, name, password_hash)
+               VALUES (%s, %s, %s)
+               ON CONFLICT (email) DO NOTHING
+               RETURNING id''',
+            (email, display_name, password_hash),
+        )
+        row = cursor.fetchone()
+        if not row:
+            return jsonify({'error': 'Account already exists'}), 409
+        user_id = row[0]
 
         conn.commit()
         session['user'] = {'id': user_id, 'email': email, 'name': display_name}
@@ -932,43 +1376,34 @@ def login_user_api():
         if not email or not password:
             return jsonify({'error': 'Username and password are required'}), 400
 
-        ensure_users_schema()
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        if USE_SQLITE:
-            cursor.execute('SELECT id, email, name, password_hash FROM users WHERE email = ?', (email,))
-        else:
-            cursor.execute('SELECT id, email, name, password_hash FROM users WHERE email = %s', (email,))
+        cursor.execute('SELECT id, email, name, password_hash FROM users WHERE email = %s', (email,))
         row = cursor.fetchone()
-        if not row:
+        if not row or row['password_hash'] == UNUSABLE_PASSWORD_HASH:
+            # Burn the same verify cost so response time doesn't reveal which accounts exist
+            verify_password(_DUMMY_HASH, password)
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        # sqlite rows support key access, but tuples will still work with indexes
-        # password_hash = row[3] if isinstance(row, tuple) else row['password_hash']
-        # if not check_password_hash(password_hash, password):
-        #     return jsonify({'error': 'Invalid credentials'}), 401
-
-        # The row object can be a tuple (for psycopg2) or a sqlite3.Row object (for sqlite3)
-        # sqlite3.Row objects allow access by column name or index.
-        # For consistency, we'll try to access by name first, then by index if it's a tuple.
-        import sqlite3 # Ensure sqlite3 is imported for sqlite3.Row check
-
-        user = {
-            'id': row['id'] if isinstance(row, sqlite3.Row) else (row[0] if isinstance(row, tuple) else row['id']),
-            'email': row['email'] if isinstance(row, sqlite3.Row) else (row[1] if isinstance(row, tuple) else row['email']),
-            'name': row['name'] if isinstance(row, sqlite3.Row) else (row[2] if isinstance(row, tuple) else row['name']),
-            'password_hash': row['password_hash'] if isinstance(row, sqlite3.Row) else (row[3] if isinstance(row, tuple) else row['password_hash']),
-        }
+        # Connections use sqlite3.Row, so the row converts straight to a dict
+        user = dict(row)
 
-        if not user or not check_password_hash(user['password_hash'], password):
+        if not user or not verify_password(user['password_hash'], password):
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        # user = {
-        #     'id': row[0] if isinstance(row, tuple) else row['id'],
-        #     'email': row[1] if isinstance(row, tuple) else row['email'],
-        #     'name': row[2] if isinstance(row, tuple) else row['name'],
-        # }
+        # Transparently upgrade legacy/outdated hashes now that we have the plaintext
+        if password_needs_rehash(user['password_hash']):
+            try:
+                cursor.execute(
+                    'UPDATE users SET password_hash = %s WHERE id = %s',
+                    (hash_password(password), user['id']),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                app.logger.warning('Failed to upgrade password hash for %s', email)
+
         # Remove password_hash from the session user object for security
         session_user_data = {k: v for k, v in user.items() if k != 'password_hash'}
         session['user'] = session_user_data
@@ -993,42 +1428,18 @@ def auth_me():
     user = session['user']
     email = user.get('email')
     
-    # Fetch role
+    # Fetch role (one cached district_users lookup; users has no admin flag of its own)
     role = 'staff' # default
-    conn = None
-    cursor = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if USE_SQLITE:
-            app.logger.info(f"Checking role for {email} in SQLite")
-            cursor.execute("SELECT role FROM district_users WHERE email=? LIMIT 1", (email,))
-        else:
-            cursor.execute("SELECT role FROM district_users WHERE email=%s LIMIT 1", (email,))
-        row = cursor.fetchone()
-        if row:
-            role = row[0]
-            app.logger.info(f"Found role for {email}: {role}")
+        district_role = get_user_role(email)
+        if district_role:
+            role = district_role
+            app.logger.info("Found role for %s: %s", email, role)
         else:
-            app.logger.warning(f"No role found for {email} in district_users")
-            
-        if role != 'admin':
-             if USE_SQLITE:
-                 cursor.execute("SELECT 1 FROM users WHERE email=? AND is_admin=1", (email,)) # Assuming an 'is_admin' column for local users
-             else:
-                 cursor.execute("SELECT 1 FROM users WHERE email=%s AND is_admin=TRUE", (email,)) # Assuming an 'is_admin' column for local users
-             if cursor.fetchone():
-                 role = 'admin' # Local users created via setup are admins? Setup made them admin in district_users anyway.
-                 
+            app.logger.warning("No role found for %s in district_users", email)
     except Exception as e:
         app.logger.error(f"Error fetching user role for {email}: {e}")
         # If there's an error, role remains 'staff' or default.
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
     return jsonify({
         'authenticated': True,
@@ -1048,6 +1459,10 @@ def auth_logout():
     return jsonify({'success': True})
 
 
+# District slugs: lowercase ASCII letters, digits and hyphens
+SLUG_RE = re.compile(r'[a-z0-9-]+')
+
+
 @app.route('/api/districts', methods=['POST'])
 def create_district():
     """Initial district setup (single-tenant only). Called during first-run setup."""
@@ -1068,7 +1483,7 @@ def create_district():
             return jsonify({'error': 'Missing required fields'}), 400
         
         # Validate slug format (alphanumeric and hyphens only)
-        if not all(c.isalnum() or c == '-' for c in district_slug):
+        if not SLUG_RE.fullmatch(district_slug):
             return jsonify({'error': 'Slug can only contain letters, numbers, and hyphens'}), 400
         
         # Validate emails
@@ -1077,13 +1492,12 @@ def create_district():
         
         # Create district
         try:
-            ensure_districts_schema()
-            ensure_district_users_schema()
-
             conn = get_db_connection()
             cursor = conn.cursor()
 
             if USE_SQLITE:
+                # Take the write lock up front: both rows land in one transaction and one commit
+                cursor.execute('BEGIN IMMEDIATE')
                 cursor.execute(
                     '''INSERT INTO districts (name, slug, contact_email, created_by_email)
                        VALUES (?, ?, ?, ?)''',
@@ -1096,20 +1510,22 @@ def create_district():
                     (district_id, creator_email, creator_name, 'admin'),
                 )
             else:
+                # Single round trip: the district insert feeds the membership insert
                 cursor.execute(
-                    '''INSERT INTO districts (name, slug, contact_email, created_by_email)
-                       VALUES (%s, %s, %s, %s)
-                       RETURNING id''',
-                    (district_name, district_slug, contact_email, creator_email),
+                    '''WITH new_district AS (
+                           INSERT INTO districts (name, slug, contact_email, created_by_email)
+                           VALUES (%s, %s, %s, %s)
+                           RETURNING id
+                       )
+                       INSERT INTO district_users (district_id, email, name, role)
+                       SELECT id, %s, %s, 'admin' FROM new_district
+                       RETURNING district_id''',
+                    (district_name, district_slug, contact_email, creator_email, creator_email, creator_name),
                 )
                 district_id = cursor.fetchone()[0]
-                cursor.execute(
-                    '''INSERT INTO district_users (district_id, email, name, role)
-                       VALUES (%s, %s, %s, %s)''',
-                    (district_id, creator_email, creator_name, 'admin'),
-                )
 
             conn.commit()
+            invalidate_user_role(creator_email)
             cursor.close()
             conn.close()
 
@@ -1121,7 +1537,8 @@ def create_district():
             }), 201
 
         except Exception as e:
-            if "UNIQUE constraint failed" in str(e) or "duplicate" in str(e):
+            conn.rollback()
+            if is_unique_violation(e):
                 return jsonify({'error': f'District slug "{district_slug}" already exists'}), 409
             app.logger.error(f'Error creating district: {str(e)}')
             return jsonify({'error': 'Failed to create district'}), 500
@@ -1131,6 +1548,57 @@ def create_district():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+SSO_SETTINGS_TTL = 300  # other workers pick up credential changes within this many seconds
+LocalSSOSettings = namedtuple('LocalSSOSettings', [
+    'google_client_id', 'google_client_secret', 'allowed_domain',
+    'apple_client_id', 'apple_team_id', 'apple_key_id',
+    'microsoft_client_id', 'microsoft_tenant_id',
+])
+
+
+@lru_cache(maxsize=1)
+def _load_local_sso_settings(_ttl_bucket):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT google_client_id, google_client_secret, allowed_domain, "
+            "apple_client_id, apple_team_id, apple_key_id, "
+            "microsoft_client_id, microsoft_tenant_id "
+            "FROM districts WHERE slug='local'"
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    return LocalSSOSettings(*row) if row else LocalSSOSettings(*([None] * len(LocalSSOSettings._fields)))
+
+
+@lru_cache(maxsize=16)
+def parse_allowed_domains(setting: str) -> frozenset:
+    """Comma-separated allowed_domain setting -> set of lowercase domains (parsed once per value)."""
+    return frozenset(d.strip().lower() for d in setting.split(','))
+
+
+def get_local_sso_settings() -> LocalSSOSettings:
+    """Return the local district's SSO credentials, re-read at most every SSO_SETTINGS_TTL seconds."""
+    return _load_local_sso_settings(int(time.time() // SSO_SETTINGS_TTL))
+
+
+# Keep-alive session for Google's token and certificate endpoints; OAuth callbacks in
+# the same worker reuse the TLS connection instead of handshaking each time.
+GOOGLE_HTTP = requests.Session()
+GOOGLE_HTTP.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10))
+GOOGLE_HTTP_TIMEOUT = 5
+# Everything in the Google consent URL except client_id and state is fixed at startup
+GOOGLE_AUTH_URL_PREFIX = 'https://accounts.google.com/o/oauth2/v2/auth?' + urlencode({
+    'redirect_uri': OAUTH_REDIRECT_URI,
+    'response_type': 'code',
+    'scope': 'openid email profile',
+    'prompt': 'select_account',
+})
+
+
 @app.route('/auth/google')
 def google_auth():
     """Initiate Google OAuth login using dynamic credentials."""
@@ -1142,17 +1610,9 @@ def google_auth():
     
     # Try fetching from DB (Local District)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if USE_SQLITE:
-            cursor.execute("SELECT google_client_id FROM districts WHERE slug='local'")
-        else:
-            cursor.execute("SELECT google_client_id FROM districts WHERE slug='local'")
-        row = cursor.fetchone()
-        if row and row[0]:
-            client_id = row[0]
-        cursor.close()
-        conn.close()
+        sso = get_local_sso_settings()
+        if sso.google_client_id:
+            client_id = sso.google_client_id
     except Exception:
         app.logger.warning("Failed to fetch district settings for SSO")
 
@@ -1164,18 +1624,7 @@ def google_auth():
     session['oauth_state'] = state
     
     # Construct redirect URL
-    params = {
-        'client_id': client_id,
-        'redirect_uri': OAUTH_REDIRECT_URI,
-        'response_type': 'code',
-        'scope': 'openid email profile',
-        'state': state,
-        'prompt': 'select_account'
-    }
-    
-    import urllib.parse
-    query_string = urllib.parse.urlencode(params)
-    auth_url = f"https://accounts.google.com/o/oauth2/v2/auth?{query_string}"
+    auth_url = f"{GOOGLE_AUTH_URL_PREFIX}&{urlencode({'client_id': client_id, 'state': state})}"
     
     return redirect(auth_url)
 
@@ -1187,16 +1636,10 @@ def apple_auth():
     team_id = os.getenv('APPLE_TEAM_ID')
     key_id = os.getenv('APPLE_KEY_ID')
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT apple_client_id, apple_team_id, apple_key_id FROM districts WHERE slug='local'")
-        row = cursor.fetchone()
-        if row:
-            client_id = row[0] or client_id
-            team_id = row[1] or team_id
-            key_id = row[2] or key_id
-        cursor.close()
-        conn.close()
+        sso = get_local_sso_settings()
+        client_id = sso.apple_client_id or client_id
+        team_id = sso.apple_team_id or team_id
+        key_id = sso.apple_key_id or key_id
     except Exception:
         app.logger.warning('Failed to fetch Apple SSO settings from DB')
     if not (client_id and team_id and key_id):
@@ -1222,15 +1665,9 @@ def microsoft_auth():
     client_id = os.getenv('MICROSOFT_CLIENT_ID')
     tenant_id = os.getenv('MICROSOFT_TENANT_ID')
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT microsoft_client_id, microsoft_tenant_id FROM districts WHERE slug='local'")
-        row = cursor.fetchone()
-        if row:
-            client_id = row[0] or client_id
-            tenant_id = row[1] or tenant_id
-        cursor.close()
-        conn.close()
+        sso = get_local_sso_settings()
+        client_id = sso.microsoft_client_id or client_id
+        tenant_id = sso.microsoft_tenant_id or tenant_id
     except Exception:
         app.logger.warning('Failed to fetch Microsoft SSO settings from DB')
     if not (client_id and tenant_id):
@@ -1255,7 +1692,8 @@ def authorize():
     """Handle Google OAuth callback with dynamic credentials."""
     # Verify state
     state = session.pop('oauth_state', None)
-    if not state or state != request.args.get('state'):
+    returned_state = request.args.get('state')
+    if not state or not returned_state or not secrets.compare_digest(state.encode(), returned_state.encode()):
         return 'Invalid state parameter', 400
         
     code = request.args.get('code')
@@ -1268,21 +1706,11 @@ def authorize():
     allowed_domain_setting = None
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        if USE_SQLITE:
-            # Note: Fetching using index 0,1,2 for safety if row factory varies
-            cursor.execute("SELECT google_client_id, google_client_secret, allowed_domain FROM districts WHERE slug='local'")
-        else:
-            cursor.execute("SELECT google_client_id, google_client_secret, allowed_domain FROM districts WHERE slug='local'")
-        row = cursor.fetchone()
-        if row:
-            # Prioritize DB creds if present
-            if row[0]: client_id = row[0]
-            if row[1]: client_secret = row[1]
-            allowed_domain_setting = row[2]
-        cursor.close()
-        conn.close()
+        sso = get_local_sso_settings()
+        # Prioritize DB creds if present
+        if sso.google_client_id: client_id = sso.google_client_id
+        if sso.google_client_secret: client_secret = sso.google_client_secret
+        allowed_domain_setting = sso.allowed_domain
     except Exception:
          app.logger.warning("Failed to fetch district settings for SSO callback")
 
@@ -1300,18 +1728,18 @@ def authorize():
     }
     
     try:
-        res = requests.post(token_url, data=token_data)
+        res = GOOGLE_HTTP.post(token_url, data=token_data, timeout=GOOGLE_HTTP_TIMEOUT)
         res.raise_for_status()
         tokens = res.json()
         id_token_jwt = tokens.get('id_token')
         
-        # Verify ID Token
+        # Verify ID Token (imported lazily: google-auth is slow to import and only this callback needs it)
         from google.oauth2 import id_token
         from google.auth.transport import requests as google_requests
         
         id_info = id_token.verify_oauth2_token(
             id_token_jwt, 
-            google_requests.Request(), 
+            google_requests.Request(session=GOOGLE_HTTP), 
             client_id
         )
         
@@ -1322,33 +1750,21 @@ def authorize():
         # Domain Restriction Check
         if allowed_domain_setting:
             # Allow multiple domains comma separated if needed, or single
-            allowed = [d.strip().lower() for d in allowed_domain_setting.split(',')]
-            user_domain = email.split('@')[-1].lower()
-            if user_domain not in allowed:
+            user_domain = email.rpartition('@')[2].lower()
+            if user_domain not in parse_allowed_domains(allowed_domain_setting):
                 return f"Access restricted. Please sign in with an account from: {allowed_domain_setting}", 403
 
         # Create/Update user in DB
-        ensure_users_schema()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Upsert user
-        if USE_SQLITE:
-            cursor.execute('SELECT id FROM users WHERE email = ?', (email,))
-            existing = cursor.fetchone()
-            if existing: # Update
-                cursor.execute('UPDATE users SET name = ?, last_login = CURRENT_TIMESTAMP WHERE email = ?',
-                             (id_info.get('name', ''), email))
-            else: # Insert
-                cursor.execute('INSERT INTO users (email, name, role) VALUES (?, ?, ?)',
-                             (email, id_info.get('name', ''), 'staff'))
-        else:
-            cursor.execute('''
-                INSERT INTO users (email, name, role) 
-                VALUES (%s, %s, 'staff')
-                ON CONFLICT (email) DO UPDATE 
-                SET name = EXCLUDED.name, last_login = NOW()
-            ''', (email, id_info.get('name', '')))
+        # Upsert user (one statement; existing local passwords are left untouched)
+        cursor.execute('''
+            INSERT INTO users (email, name, password_hash)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (email) DO UPDATE
+            SET name = excluded.name, updated_at = CURRENT_TIMESTAMP
+        ''', (email, id_info.get('name', ''), UNUSABLE_PASSWORD_HASH))
             
         conn.commit()
         
@@ -1392,7 +1808,6 @@ def create_app_request():
     if not app_name:
         return jsonify({'error': 'App name is required'}), 400
 
-    ensure_app_requests_schema()
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -1425,27 +1840,15 @@ def admin_required(f):
         
         email = session['user']['email']
         # Check hardcoded list first
-        if email in ADMIN_EMAILS:
+        if email.lower() in ADMIN_EMAILS:
             return f(*args, **kwargs)
 
         # Check database role
-        conn = get_db_connection()
-        cursor = conn.cursor()
         is_admin = False
         try:
-            # Check if user has admin role
-            if USE_SQLITE:
-                cursor.execute("SELECT 1 FROM district_users WHERE email=? AND role='admin'", (email,))
-            else:
-                cursor.execute("SELECT 1 FROM district_users WHERE email=%s AND role='admin'", (email,))
-            
-            if cursor.fetchone():
-                is_admin = True
+            is_admin = get_user_role(email) == 'admin'
         except Exception as e:
             app.logger.error(f"Error checking admin role: {e}")
-        finally:
-            cursor.close()
-            conn.close()
 
         if not is_admin:
             return jsonify({'error': 'Admin access required'}), 403
@@ -1454,24 +1857,65 @@ def admin_required(f):
     return decorated_function
 
 
+def get_user_role(email: str):
+    """Return the user's district role ('admin' if any membership is admin), or None.
+
+    Memoized on flask.g for the current request and in ROLE_CACHE for ROLE_CACHE_TTL seconds.
+    """
+    request_roles = g.setdefault('role_cache', {})
+    if email in request_roles:
+        return request_roles[email]
+    with ROLE_CACHE_LOCK:
+        role = ROLE_CACHE.get(email, _ROLE_MISSING)
+    if role is _ROLE_MISSING:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # role is CHECKed to 'admin'/'staff', so MIN() picks admin; answered from
+            # idx_district_users_email_role with a single index seek and no sort
+            cursor.execute("SELECT MIN(role) FROM district_users WHERE email=%s", (email,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        role = row[0] if row else None
+        with ROLE_CACHE_LOCK:
+            ROLE_CACHE[email] = role
+    request_roles[email] = role
+    return role
+
+
+def get_district_id(cursor, slug):
+    """Return the district id for a slug (cached in DISTRICT_ID_CACHE), or None."""
+    with DISTRICT_ID_CACHE_LOCK:
+        district_id = DISTRICT_ID_CACHE.get(slug)
+    if district_id is None:
+        cursor.execute("SELECT id FROM districts WHERE slug = %s", (slug,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        district_id = row[0]
+        with DISTRICT_ID_CACHE_LOCK:
+            DISTRICT_ID_CACHE[slug] = district_id
+    return district_id
+
+
+def invalidate_user_role(email: str):
+    """Drop a cached role after its district_users rows change."""
+    with ROLE_CACHE_LOCK:
+        ROLE_CACHE.pop(email, None)
+    if 'role_cache' in g:
+        g.role_cache.pop(email, None)
+
+
 def is_admin_email(email: str) -> bool:
     """Check if the provided email has admin privileges."""
     if not email:
         return False
-    if email in ADMIN_EMAILS:
+    if email.lower() in ADMIN_EMAILS:
         return True
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM district_users WHERE email=? AND role='admin' LIMIT 1" if USE_SQLITE else
-            "SELECT 1 FROM district_users WHERE email=%s AND role='admin' LIMIT 1",
-            (email,)
-        )
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return bool(row)
+        return get_user_role(email) == 'admin'
     except Exception:
         return False
 
@@ -1483,6 +1927,13 @@ def require_session_user_json():
         return None, (jsonify({'error': 'Authentication required'}), 401)
     return user, None
 
+
+def request_payload():
+    """Body fields of a JSON or form-encoded/multipart request, parsing only the kind that was sent."""
+    if request.is_json:
+        return request.get_json(silent=True) or {}
+    return request.form
+
 # Application statuses
 STATUSES = [
     'Pending',
@@ -1507,14 +1958,8 @@ SOPPA_STATUSES = [
 ]
 
 def _contact_row_to_dict(row):
-    def _dt_to_str(val):
-        try:
-            if hasattr(val, 'isoformat'):
-                return val.isoformat()
-            return str(val) if val is not None else None
-        except Exception:
-            return None
-
+    # Timestamps arrive as the TEXT SQLite stores (connections don't set detect_types),
+    # so they are emitted as-is rather than parsed and re-formatted
     return {
         'id': row[0],
         'app_id': row[1],
@@ -1525,8 +1970,8 @@ def _contact_row_to_dict(row):
         'notes': row[6] or '',
         'is_primary': bool(row[7]),
         'tags': row[8] or '',
-        'created_at': _dt_to_str(row[9]),
-        'updated_at': _dt_to_str(row[10]),
+        'created_at': row[9],
+        'updated_at': row[10],
     }
 
 
@@ -1557,13 +2002,12 @@ def _validate_contact_payload(data, require_email: bool = True):
 @app.route('/api/admin/apps/<int:app_id>/contacts', methods=['GET', 'POST'])
 @admin_required
 def api_vendor_contacts(app_id: int):
-    ensure_vendor_contacts_schema()
     conn = get_db_connection()
     cursor = conn.cursor()
 
     # Confirm app exists
     cursor.execute(
-        'SELECT id, name FROM apps WHERE id=?' if USE_SQLITE else 'SELECT id, name FROM apps WHERE id=%s',
+        'SELECT id, name FROM apps WHERE id=%s',
         (app_id,),
     )
     app_row = cursor.fetchone()
@@ -1573,18 +2017,36 @@ def api_vendor_contacts(app_id: int):
         return jsonify({'error': 'App not found'}), 404
 
     if request.method == 'GET':
-        cursor.execute(
-            '''SELECT id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at
-               FROM vendor_contacts WHERE app_id=? ORDER BY is_primary DESC, name ASC'''
-            if USE_SQLITE else
-            '''SELECT id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at
-               FROM vendor_contacts WHERE app_id=%s ORDER BY is_primary DESC, name ASC''',
-            (app_id,),
-        )
-        rows = cursor.fetchall()
+        # The database builds the response body (same shape as _contact_row_to_dict),
+        # so no per-row dicts are created or re-encoded in Python.
+        if USE_SQLITE:
+            cursor.execute(
+                '''SELECT json_object('contacts', json_group_array(json_object(
+                       'id', id, 'app_id', app_id, 'name', COALESCE(name, ''),
+                       'email', COALESCE(email, ''), 'phone', COALESCE(phone, ''),
+                       'role', COALESCE(role, ''), 'notes', COALESCE(notes, ''),
+                       'is_primary', json(CASE WHEN is_primary THEN 'true' ELSE 'false' END),
+                       'tags', COALESCE(tags, ''), 'created_at', created_at, 'updated_at', updated_at
+                   )))
+                   FROM (SELECT * FROM vendor_contacts WHERE app_id=? ORDER BY is_primary DESC, name ASC)''',
+                (app_id,),
+            )
+        else:
+            cursor.execute(
+                '''SELECT json_build_object('contacts', COALESCE(json_agg(json_build_object(
+                       'id', id, 'app_id', app_id, 'name', COALESCE(name, ''),
+                       'email', COALESCE(email, ''), 'phone', COALESCE(phone, ''),
+                       'role', COALESCE(role, ''), 'notes', COALESCE(notes, ''),
+                       'is_primary', COALESCE(is_primary, FALSE),
+                       'tags', COALESCE(tags, ''), 'created_at', created_at, 'updated_at', updated_at
+                   ) ORDER BY is_primary DESC, name ASC), '[]'::json))::text
+                   FROM vendor_contacts WHERE app_id=%s''',
+                (app_id,),
+            )
+        body = cursor.fetchone()[0]
         cursor.close()
         conn.close()
-        return jsonify({'contacts': [_contact_row_to_dict(r) for r in rows]})
+        return Response(body, mimetype='application/json')
 
     # POST create
     payload = request.get_json() or {}
@@ -1641,8 +2103,7 @@ def api_vendor_contacts(app_id: int):
         return jsonify({'contact': _contact_row_to_dict(new_row)}), 201
     except Exception as exc:
         conn.rollback()
-        # For SQLite, unique errors surface as generic IntegrityError
-        if 'UNIQUE' in str(exc).upper():
+        if is_unique_violation(exc):
             return jsonify({'error': 'Contact already exists for this app'}), 409
         app.logger.exception('Failed to create vendor contact')
         return jsonify({'error': 'Unable to create contact'}), 500
@@ -1654,15 +2115,14 @@ def api_vendor_contacts(app_id: int):
 @app.route('/api/admin/contacts/<int:contact_id>', methods=['PUT', 'DELETE'])
 @admin_required
 def api_vendor_contact_detail(contact_id: int):
-    ensure_vendor_contacts_schema()
     conn = get_db_connection()
     cursor = conn.cursor()
+    # Contact and its app's name in one query (row[11] is the app name)
     cursor.execute(
-          '''SELECT id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at
-              FROM vendor_contacts WHERE id=?'''
-          if USE_SQLITE else
-          '''SELECT id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at
-              FROM vendor_contacts WHERE id=%s''',
+          '''SELECT vc.id, vc.app_id, vc.name, vc.email, vc.phone, vc.role, vc.notes, vc.is_primary,
+                    vc.tags, vc.created_at, vc.updated_at, a.name
+              FROM vendor_contacts vc LEFT JOIN apps a ON a.id = vc.app_id
+              WHERE vc.id=%s''',
           (contact_id,),
     )
     row = cursor.fetchone()
@@ -1672,12 +2132,7 @@ def api_vendor_contact_detail(contact_id: int):
         return jsonify({'error': 'Contact not found'}), 404
 
     app_id = row[1]
-    cursor.execute(
-        'SELECT name FROM apps WHERE id=?' if USE_SQLITE else 'SELECT name FROM apps WHERE id=%s',
-        (app_id,),
-    )
-    app_row = cursor.fetchone()
-    app_name = app_row[0] if app_row else ''
+    app_name = row[11] or ''
 
     if request.method == 'DELETE':
         payload = request.get_json() or {}
@@ -1687,7 +2142,7 @@ def api_vendor_contact_detail(contact_id: int):
             conn.close()
             return jsonify({'error': 'Invalid CSRF token'}), 403
         cursor.execute(
-            'DELETE FROM vendor_contacts WHERE id=?' if USE_SQLITE else 'DELETE FROM vendor_contacts WHERE id=%s',
+            'DELETE FROM vendor_contacts WHERE id=%s',
             (contact_id,),
         )
         conn.commit()
@@ -1717,18 +2172,12 @@ def api_vendor_contact_detail(contact_id: int):
         return jsonify({'error': errors}), 400
 
     try:
-        update_sql = (
-            '''UPDATE vendor_contacts
-               SET name=?, email=?, phone=?, role=?, notes=?, tags=?, is_primary=?, updated_at=CURRENT_TIMESTAMP
-               WHERE id=?'''
-            if USE_SQLITE else
+        # RETURNING (SQLite 3.35+) hands back the stored row, so no re-SELECT is needed
+        cursor.execute(
             '''UPDATE vendor_contacts
-               SET name=%s, email=%s, phone=%s, role=%s, notes=%s, tags=%s, is_primary=%s, updated_at=NOW()
+               SET name=%s, email=%s, phone=%s, role=%s, notes=%s, tags=%s, is_primary=%s, updated_at=CURRENT_TIMESTAMP
                WHERE id=%s
-               RETURNING id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at'''
-        )
-        cursor.execute(
-            update_sql,
+               RETURNING id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at''',
             (
                 cleaned['name'] or row[2],
                 cleaned['email'] or row[3],
@@ -1740,16 +2189,8 @@ def api_vendor_contact_detail(contact_id: int):
                 contact_id,
             ),
         )
+        updated = cursor.fetchone()
         conn.commit()
-        if USE_SQLITE:
-            cursor.execute(
-                '''SELECT id, app_id, name, email, phone, role, notes, is_primary, tags, created_at, updated_at
-                   FROM vendor_contacts WHERE id=?''',
-                (contact_id,),
-            )
-            updated = cursor.fetchone()
-        else:
-            updated = cursor.fetchone()
         record_app_activity(
             action='update',
             app_id=app_id,
@@ -1762,7 +2203,7 @@ def api_vendor_contact_detail(contact_id: int):
         return jsonify({'contact': _contact_row_to_dict(updated)})
     except Exception as exc:
         conn.rollback()
-        if 'UNIQUE' in str(exc).upper():
+        if is_unique_violation(exc):
             return jsonify({'error': 'Contact already exists for this app'}), 409
         app.logger.exception('Failed to update vendor contact')
         return jsonify({'error': 'Unable to update contact'}), 500
@@ -1774,10 +2215,16 @@ def api_vendor_contact_detail(contact_id: int):
 @admin_required
 def api_admin_apps():
     """Return a lightweight list of all apps for admin UI consumers."""
-    ensure_vendor_contacts_schema()
+    global _admin_apps_cache
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        # Read the version before the data: a write landing in between only makes the
+        # stored copy look older than it is, never newer.
+        version = get_cache_version(cursor, 'admin_apps')
+        cached_version, cached_body = _admin_apps_cache
+        if version is not None and version == cached_version:
+            return Response(cached_body, mimetype='application/json')
         cursor.execute(
             """
             SELECT a.id,
@@ -1786,13 +2233,8 @@ def api_admin_apps():
                    a.status,
                    a.soppa_compliant,
                    a.product_visibility,
-                   COALESCE(vc.count_contacts, 0) AS contact_count
+                   (SELECT COUNT(1) FROM vendor_contacts vc WHERE vc.app_id = a.id) AS contact_count
             FROM apps a
-            LEFT JOIN (
-                SELECT app_id, COUNT(1) AS count_contacts
-                FROM vendor_contacts
-                GROUP BY app_id
-            ) vc ON vc.app_id = a.id
             ORDER BY a.name ASC
             """
         )
@@ -1809,7 +2251,10 @@ def api_admin_apps():
             }
             for row in rows
         ]
-        return jsonify({'apps': apps})
+        body = app.json.dumps({'apps': apps})
+        if version is not None:
+            _admin_apps_cache = (version, body)
+        return Response(body, mimetype='application/json')
     except Exception:
         app.logger.exception('Failed to load apps for API')
         return jsonify({'error': 'Unable to load apps'}), 500
@@ -1821,8 +2266,6 @@ def api_admin_apps():
 @admin_required
 def serve_invoice(filename):
     """Serve invoice files only to authenticated admins (with path traversal protection)."""
-    from flask import send_from_directory
-    
     # Extract just the filename from full paths (handles /static/documents/file.pdf or /documents/file.pdf)
     # This provides backward compatibility with old database records
     filename = Path(filename).name
@@ -1846,10 +2289,20 @@ def serve_invoice(filename):
         abort(403)
     
     # Check if file exists
-    if not target_path.exists():
+    if not target_path.is_file():
         abort(404)
     
-    # Serve the file
+    # Let the front-end server push the bytes; the access checks above have already passed
+    if INVOICE_ACCEL_REDIRECT_PREFIX or INVOICE_X_SENDFILE:
+        response = Response(mimetype=mimetypes.guess_type(safe_name)[0] or 'application/octet-stream')
+        response.headers['Content-Disposition'] = f'inline; filename="{safe_name}"'
+        if INVOICE_ACCEL_REDIRECT_PREFIX:
+            response.headers['X-Accel-Redirect'] = f"{INVOICE_ACCEL_REDIRECT_PREFIX}/{safe_name}"
+        else:
+            response.headers['X-Sendfile'] = str(target_path)
+        return response
+    
+    # Serve the file through the WSGI server's file wrapper (sendfile(2) under gunicorn)
     return send_from_directory(str(upload_root), safe_name)
 
 @app.route('/admin/apps/<int:app_id>/upload-invoice', methods=['POST'])
@@ -1869,30 +2322,27 @@ def upload_invoice(app_id: int):
     
     try:
         # Verify app exists
-        cursor.execute("SELECT invoices FROM apps WHERE id=%s", (app_id,))
-        result = cursor.fetchone()
-        if not result:
+        cursor.execute("SELECT 1 FROM apps WHERE id=%s", (app_id,))
+        if not cursor.fetchone():
             return jsonify({'success': False, 'error': 'App not found'}), 404
         
-        # Get current invoices
-        current_invoices = result[0] or ''
-        invoice_list = [inv.strip() for inv in current_invoices.split(',') if inv.strip()]
-        
         # Upload each file
         uploaded_paths = []
         for file in files:
             if file and allowed_file(file.filename):
                 uploaded_path = save_uploaded_file(file, prefix='invoice')
                 if uploaded_path:
-                    invoice_list.append(uploaded_path)
                     uploaded_paths.append(uploaded_path)
         
         if not uploaded_paths:
             return jsonify({'success': False, 'error': 'No valid files uploaded'}), 400
         
-        # Update database
-        new_invoices = ','.join(invoice_list)
-        cursor.execute("UPDATE apps SET invoices=%s WHERE id=%s", (new_invoices, app_id))
+        cursor.executemany(
+            "INSERT INTO app_invoices (app_id, path, filename) VALUES (%s, %s, %s)",
+            [(app_id, path, Path(path).name) for path in uploaded_paths],
+        )
+        cursor.execute("SELECT path FROM app_invoices WHERE app_id=%s ORDER BY id", (app_id,))
+        invoice_list = [row[0] for row in cursor.fetchall()]
         conn.commit()
         
         return jsonify({
@@ -1934,27 +2384,16 @@ def delete_invoice(app_id: int):
     cursor = conn.cursor()
     
     try:
-        # Get current invoices from database
-        cursor.execute("SELECT invoices FROM apps WHERE id=%s", (app_id,))
-        result = cursor.fetchone()
-        
-        if not result:
-            return jsonify({'success': False, 'error': 'App not found'}), 404
-        
-        current_invoices = result[0] or ''
-        invoice_list = [inv.strip() for inv in current_invoices.split(',') if inv.strip()]
-        
         # Match by basename to tolerate different stored path formats
-        matched = [inv for inv in invoice_list if Path(inv).name == filename]
-        if not matched:
+        cursor.execute(
+            "DELETE FROM app_invoices WHERE app_id=%s AND filename=%s",
+            (app_id, filename),
+        )
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM apps WHERE id=%s", (app_id,))
+            if not cursor.fetchone():
+                return jsonify({'success': False, 'error': 'App not found'}), 404
             return jsonify({'success': False, 'error': 'Invoice not associated with this app'}), 403
-        
-        # Remove matched entries
-        invoice_list = [inv for inv in invoice_list if Path(inv).name != filename]
-        
-        # Update database with remaining invoices
-        new_invoices = ','.join(invoice_list)
-        cursor.execute("UPDATE apps SET invoices=%s WHERE id=%s", (new_invoices, app_id))
         conn.commit()
         
         # Delete the physical file if it exists (with path traversal protection)
@@ -1988,33 +2427,41 @@ def delete_invoice(app_id: int):
 # SETUP / FIRST RUN ENDPOINTS
 # -------------------------------------------------------------------
 
+# Set once setup is complete; setup_init refuses to run again and slugs never change,
+# so the answer holds for the rest of the process
+_setup_status_cache = None
+
+
 @app.route('/api/setup/status')
 def setup_status():
     """Check if the application is already set up."""
+    global _setup_status_cache
+    if _setup_status_cache is not None:
+        return jsonify(_setup_status_cache)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT COUNT(1) FROM districts")
-        district_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(1) FROM users")
-        user_count = cursor.fetchone()[0]
+        # One round trip; EXISTS stops at the first row instead of counting the table
+        cursor.execute(
+            """SELECT EXISTS(SELECT 1 FROM districts),
+                      EXISTS(SELECT 1 FROM users),
+                      (SELECT slug FROM districts ORDER BY id LIMIT 1)"""
+        )
+        has_district, has_user, first_slug = cursor.fetchone()
         
         # If we have a district and a user, setup is complete
-        is_setup = (district_count > 0 and user_count > 0)
+        is_setup = bool(has_district and has_user)
         
         # If setup is done, return the district slug
-        redirect_slug = None
-        if is_setup:
-            cursor.execute("SELECT slug FROM districts LIMIT 1")
-            row = cursor.fetchone()
-            if row:
-                redirect_slug = row[0]
-                
-        return jsonify({
+        redirect_slug = first_slug if is_setup else None
+        status = {
             'is_setup': is_setup,
             'redirect_slug': redirect_slug
-        })
+        }
+        if is_setup:
+            _setup_status_cache = status
+                
+        return jsonify(status)
     except Exception:
         app.logger.exception("Error checking setup status")
         return jsonify({'error': 'Internal error'}), 500
@@ -2025,6 +2472,7 @@ def setup_status():
 @app.route('/api/setup/init', methods=['POST'])
 def setup_init():
     """Initialize the application: create admin and district."""
+    global _setup_status_cache
     data = request.get_json() or {}
     
     admin_email = data.get('admin_email', '').strip().lower()
@@ -2037,7 +2485,7 @@ def setup_init():
         return jsonify({'error': 'All fields are required'}), 400
         
     # Basic slug validation
-    if not re.match(r'^[a-z0-9-]+$', district_slug):
+    if not SLUG_RE.fullmatch(district_slug):
          return jsonify({'error': 'Invalid slug format. Use lowercase letters, numbers, and dashes.'}), 400
 
     conn = get_db_connection()
@@ -2066,7 +2514,7 @@ def setup_init():
             district_id = cursor.fetchone()[0]
         
         # 3. Create Password User (for local auth)
-        pw_hash = generate_password_hash(admin_password)
+        pw_hash = hash_password(admin_password)
         
         # Simple UPSERT for both (Postgres 9.5+, SQLite 3.24+)
         cursor.execute(
@@ -2081,6 +2529,8 @@ def setup_init():
         )
 
         conn.commit()
+        invalidate_user_role(admin_email)
+        _setup_status_cache = {'is_setup': True, 'redirect_slug': district_slug}
         return jsonify({'success': True, 'slug': district_slug})
 
     except Exception:
@@ -2095,9 +2545,6 @@ def setup_init():
 def get_district(slug):
     """Get district info by slug."""
     try:
-        ensure_districts_schema()
-        ensure_default_district()
-        ensure_default_admin()
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -2108,16 +2555,7 @@ def get_district(slug):
             "microsoft_client_id, microsoft_tenant_id, microsoft_client_secret"
         )
 
-        if USE_SQLITE:
-            cursor.execute(
-                f'''SELECT {select_cols} FROM districts WHERE slug = ?''',
-                (slug,),
-            )
-        else:
-            cursor.execute(
-                f'''SELECT {select_cols} FROM districts WHERE slug = %s''',
-                (slug,),
-            )
+        cursor.execute(f'''SELECT {select_cols} FROM districts WHERE slug = %s''', (slug,))
         
         row = cursor.fetchone()
         cursor.close()
@@ -2126,49 +2564,45 @@ def get_district(slug):
         if not row:
             return jsonify({'error': 'District not found'}), 404
         
-        created_at_value = row[4]
-        if hasattr(created_at_value, "isoformat"):
-            created_at_value = created_at_value.isoformat()
-        
-        # Determine appropriate row access method
-        import sqlite3
-        is_sqlite_row = isinstance(row, sqlite3.Row)
-        
-        # Security: Mask the client secret
-        client_secret = row['google_client_secret'] if is_sqlite_row else row[10]
-        apple_private_key = row['apple_private_key'] if is_sqlite_row else row[14]
-        ms_client_secret = row['microsoft_client_secret'] if is_sqlite_row else row[17]
+        # Column names match the response keys, so the Row converts straight to the payload
+        district = dict(row)
 
-        masked_secret = '********' if client_secret else None
-        masked_apple_key = '********' if apple_private_key else None
-        masked_ms_secret = '********' if ms_client_secret else None
+        # Security: Mask the client secrets
+        for secret_key in ('google_client_secret', 'apple_private_key', 'microsoft_client_secret'):
+            district[secret_key] = '********' if district[secret_key] else None
 
-        return jsonify({
-            'id': row['id'] if is_sqlite_row else row[0],
-            'name': row['name'] if is_sqlite_row else row[1],
-            'slug': row['slug'] if is_sqlite_row else row[2],
-            'contact_email': row['contact_email'] if is_sqlite_row else row[3],
-            'created_at': created_at_value,
-            'logo_url': row['logo_url'] if is_sqlite_row else row[5],
-            'primary_color': row['primary_color'] if is_sqlite_row else row[6],
-            'accent_color': row['accent_color'] if is_sqlite_row else row[7],
-            'allowed_domain': row['allowed_domain'] if is_sqlite_row else row[8],
-            'google_client_id': row['google_client_id'] if is_sqlite_row else row[9],
-            'google_client_secret': masked_secret,
-            'apple_client_id': row['apple_client_id'] if is_sqlite_row else row[11],
-            'apple_team_id': row['apple_team_id'] if is_sqlite_row else row[12],
-            'apple_key_id': row['apple_key_id'] if is_sqlite_row else row[13],
-            'apple_private_key': masked_apple_key,
-            'microsoft_client_id': row['microsoft_client_id'] if is_sqlite_row else row[15],
-            'microsoft_tenant_id': row['microsoft_tenant_id'] if is_sqlite_row else row[16],
-            'microsoft_client_secret': masked_ms_secret,
-        }), 200
+        return jsonify(district), 200
     
     except Exception as e:
         app.logger.error(f'Error getting district: {str(e)}')
         return jsonify({'error': 'Internal server error'}), 500
 
 
+# Static so the statement text (and SQLite's prepared statement cache) is shared by every save
+UPDATE_DISTRICT_SQL = '''
+    UPDATE districts
+    SET name = COALESCE(%s, name),
+        primary_color = %s,
+        accent_color = %s,
+        allowed_domain = %s,
+        google_client_id = %s,
+        apple_client_id = %s,
+        apple_team_id = %s,
+        apple_key_id = %s,
+        microsoft_client_id = %s,
+        microsoft_tenant_id = %s,
+        google_client_secret = COALESCE(%s, google_client_secret),
+        apple_private_key = COALESCE(%s, apple_private_key),
+        microsoft_client_secret = COALESCE(%s, microsoft_client_secret)
+    WHERE slug = %s
+'''
+
+
+def _submitted_secret(value):
+    """Return a newly entered secret, or None when the form sent back blank/the mask."""
+    return value if value and value != '********' else None
+
+
 @app.route('/api/districts/<slug>', methods=['PUT'])
 @admin_required
 def update_district(slug):
@@ -2194,20 +2628,7 @@ def update_district(slug):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Build dynamic query based on whether secret is provided (don't overwrite with blank if not changing)
-        update_fields = [
-            "name = COALESCE(?, name)",
-            "primary_color = ?",
-            "accent_color = ?",
-            "allowed_domain = ?",
-            "google_client_id = ?",
-            "apple_client_id = ?",
-            "apple_team_id = ?",
-            "apple_key_id = ?",
-            "microsoft_client_id = ?",
-            "microsoft_tenant_id = ?"
-        ]
-        params = [
+        cursor.execute(UPDATE_DISTRICT_SQL, (
             name,
             primary_color,
             accent_color,
@@ -2218,38 +2639,16 @@ def update_district(slug):
             apple_key_id,
             microsoft_client_id,
             microsoft_tenant_id,
-        ]
-        
-        # Only update secret if provided and not masked
-        if google_client_secret and google_client_secret != '********':
-            update_fields.append("google_client_secret = ?")
-            params.append(google_client_secret)
-
-        if apple_private_key and apple_private_key != '********':
-            update_fields.append("apple_private_key = ?")
-            params.append(apple_private_key)
-
-        if microsoft_client_secret and microsoft_client_secret != '********':
-            update_fields.append("microsoft_client_secret = ?")
-            params.append(microsoft_client_secret)
-            
-        params.append(slug)
-        
-        query_sql = f'''
-            UPDATE districts 
-            SET {', '.join(update_fields)}
-            WHERE slug = ?
-        '''
-        
-        if not USE_SQLITE:
-            # Convert ? to %s for Postgres
-            query_sql = query_sql.replace('?', '%s')
-            
-        cursor.execute(query_sql, tuple(params))
+            _submitted_secret(google_client_secret),
+            _submitted_secret(apple_private_key),
+            _submitted_secret(microsoft_client_secret),
+            slug,
+        ))
             
         conn.commit()
         cursor.close()
         conn.close()
+        _load_local_sso_settings.cache_clear()
         
         return jsonify({'success': True})
     except Exception as e:
@@ -2259,31 +2658,56 @@ def update_district(slug):
 
 @app.route('/api/districts/<slug>/apps', methods=['GET'])
 def api_district_apps(slug):
-    """Return all apps (single-tenant application)."""
+    """Return all apps (single-tenant application).
+
+    ``?include=contacts`` (admins only) attaches each app's vendor contacts,
+    aggregated in the same query so callers don't fetch them per app.
+    """
+    include_contacts = 'contacts' in request.args.get('include', '').split(',')
+    if include_contacts:
+        user, error_resp = require_session_user_json()
+        if error_resp:
+            return error_resp
+        if not is_admin_email(user.get('email')):
+            return jsonify({'error': 'Admin privileges required'}), 403
+
+    contacts_col = ''
+    if include_contacts:
+        if USE_SQLITE:
+            contacts_col = """, (SELECT json_group_array(json_object(
+                       'id', id, 'name', COALESCE(name, ''), 'email', COALESCE(email, ''),
+                       'phone', COALESCE(phone, ''), 'role', COALESCE(role, ''),
+                       'is_primary', json(CASE WHEN is_primary THEN 'true' ELSE 'false' END)))
+                   FROM (SELECT * FROM vendor_contacts vc WHERE vc.app_id = a.id
+                         ORDER BY is_primary DESC, name ASC)) AS contacts"""
+        else:
+            contacts_col = """, (SELECT COALESCE(json_agg(json_build_object(
+                       'id', id, 'name', COALESCE(name, ''), 'email', COALESCE(email, ''),
+                       'phone', COALESCE(phone, ''), 'role', COALESCE(role, ''),
+                       'is_primary', COALESCE(is_primary, FALSE)
+                   ) ORDER BY is_primary DESC, name ASC), '[]'::json)::text
+                   FROM vendor_contacts vc WHERE vc.app_id = a.id) AS contacts"""
+
     try:
-        ensure_default_district()
-        init_db()  # Ensure tables exist before querying
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            """SELECT id, name, company, status, soppa_compliant, product_visibility, product_link, tags, privacy_link, otherdocs
-                   FROM apps ORDER BY name ASC"""
+            f"""SELECT a.id, COALESCE(a.name, '') AS name, COALESCE(a.company, '') AS company,
+                       COALESCE(a.status, '') AS status, COALESCE(a.soppa_compliant, '') AS soppa_compliant,
+                       a.product_visibility, COALESCE(a.product_link, '') AS product_link,
+                       COALESCE(a.tags, '') AS tags, COALESCE(a.privacy_link, '') AS ndpa_path,
+                       COALESCE(a.otherdocs, '') AS exhibit_e_path{contacts_col}
+                   FROM apps a ORDER BY a.name ASC"""
         )
-        rows = cursor.fetchall()
-        apps = []
-        for r in rows:
-            apps.append({
-                'id': r[0],
-                'name': r[1] or '',
-                'company': r[2] or '',
-                'status': r[3] or '',
-                'soppa_compliant': r[4] or '',
-                'product_visibility': bool(r[5]),
-                'product_link': r[6] or '',
-                'tags': r[7] or '',
-                'ndpa_path': normalize_doc_path(r[8] or ''),
-                'exhibit_e_path': normalize_doc_path(r[9] or ''),
-            })
+        # Columns are aliased to the response keys with NULLs already mapped to '',
+        # so each Row converts straight to a dict and only needs these fix-ups
+        apps = [dict(r) for r in cursor.fetchall()]
+        for item in apps:
+            item['product_visibility'] = bool(item['product_visibility'])
+            item['ndpa_path'] = normalize_doc_path(item['ndpa_path'])
+            item['exhibit_e_path'] = normalize_doc_path(item['exhibit_e_path'])
+            if include_contacts:
+                item['contacts'] = orjson.loads(item['contacts'])
         cursor.close()
         conn.close()
         return jsonify(apps)
@@ -2301,11 +2725,8 @@ def api_create_district_app(slug):
     if not is_admin_email(user.get('email')):
         return jsonify({'error': 'Admin privileges required'}), 403
 
-    init_db()
     # Accept JSON or form-encoded / multipart payloads
-    data = request.get_json(silent=True) or {}
-    if not data and request.form:
-        data = request.form.to_dict()
+    data = request_payload()
     name = (data.get('name') or '').strip()
     company = (data.get('company') or '').strip()
     status = (data.get('status') or 'Pending').strip() or 'Pending'
@@ -2401,15 +2822,48 @@ def api_create_district_app(slug):
             }
         }), 201
     except Exception as exc:
-        if 'conn' in locals():
-            try:
-                conn.rollback()
-            except Exception:
-                pass
+        # reset_db_connection rolls back the pooled connection at teardown
         app.logger.error('Failed to create app via API: %s', exc)
         return jsonify({'error': 'Unable to create app'}), 500
 
 
+# The two fixed forms of the app PUT (with/without a visibility change), kept as
+# constants so each is compiled once per connection by sqlite3's statement cache
+_UPDATE_APP_SQL_TEMPLATE = """
+    UPDATE apps
+    SET name = COALESCE(?, name),
+        status = COALESCE(?, status),
+        company = COALESCE(?, company),
+        soppa_compliant = COALESCE(?, soppa_compliant),
+        privacy_link = COALESCE(?, privacy_link),
+        product_link = COALESCE(?, product_link),
+        tags = COALESCE(?, tags),
+        notes = COALESCE(?, notes),
+        otherdocs = COALESCE(?, otherdocs)
+        {visibility_clause}
+    WHERE id = ?
+    RETURNING name, company, status, soppa_compliant, privacy_link, product_link, tags, notes, product_visibility, otherdocs
+"""
+UPDATE_APP_SQL = _UPDATE_APP_SQL_TEMPLATE.format(visibility_clause='')
+UPDATE_APP_WITH_VISIBILITY_SQL = _UPDATE_APP_SQL_TEMPLATE.format(visibility_clause=', product_visibility = ?')
+
+
+def _app_row_to_dict(row):
+    """Activity-log snapshot of an app row (columns as in the PUT's SELECT/RETURNING)."""
+    return {
+        'name': row[0],
+        'company': row[1],
+        'status': row[2],
+        'soppa_compliant': row[3],
+        'privacy_link': normalize_doc_path(row[4]) if row[4] else row[4],
+        'product_link': row[5],
+        'tags': row[6],
+        'notes': row[7],
+        'product_visibility': bool(row[8]) if row[8] is not None else None,
+        'otherdocs': normalize_doc_path(row[9]) if row[9] else row[9],
+    }
+
+
 @app.route('/api/districts/<slug>/apps/<int:app_id>', methods=['PUT', 'DELETE'])
 def api_update_delete_app(slug, app_id):
     """Update or delete an app (admin only)."""
@@ -2419,14 +2873,14 @@ def api_update_delete_app(slug, app_id):
     if not is_admin_email(user.get('email')):
         return jsonify({'error': 'Admin privileges required'}), 403
 
-    init_db()
     conn = get_db_connection()
     cursor = conn.cursor()
 
     if request.method == 'DELETE':
         try:
+            # RETURNING (SQLite 3.35+) reports what was deleted, so no lookup beforehand
             cursor.execute(
-                "SELECT name, company, status FROM apps WHERE id = ?",
+                "DELETE FROM apps WHERE id = ? RETURNING name, company, status",
                 (app_id,),
             )
             row = cursor.fetchone()
@@ -2434,8 +2888,6 @@ def api_update_delete_app(slug, app_id):
                 cursor.close()
                 conn.close()
                 return jsonify({'error': 'App not found'}), 404
-
-            cursor.execute("DELETE FROM apps WHERE id = ?", (app_id,))
             conn.commit()
             cursor.close()
             conn.close()
@@ -2467,7 +2919,7 @@ def api_update_delete_app(slug, app_id):
             conn.close()
             return jsonify({'error': 'App not found'}), 404
 
-        payload = request.form if request.form else request.get_json() or {}
+        payload = request_payload()
         name = (payload.get('name') or '').strip()
         status = (payload.get('status') or '').strip()
         company = (payload.get('company') or '').strip()
@@ -2481,9 +2933,9 @@ def api_update_delete_app(slug, app_id):
             product_visibility = 1 if product_visibility.lower() in ('1', 'true', 'yes', 'on') else 0
 
         # File uploads (ndpa, exhibit_e, logo)
-        ndpa_file = request.files.get('ndpa') if hasattr(request, 'files') else None
-        exhibit_e_file = request.files.get('exhibit_e') if hasattr(request, 'files') else None
-        logo_file = request.files.get('logo') if hasattr(request, 'files') else None
+        ndpa_file = request.files.get('ndpa')
+        exhibit_e_file = request.files.get('exhibit_e')
+        logo_file = request.files.get('logo')
         if ndpa_file and ndpa_file.filename:
             uploaded = save_uploaded_file(ndpa_file, prefix='ndpa')
             if uploaded:
@@ -2502,20 +2954,7 @@ def api_update_delete_app(slug, app_id):
         otherdocs = (payload.get('otherdocs') or '').strip()
 
         cursor.execute(
-            """
-            UPDATE apps
-            SET name = COALESCE(?, name),
-                status = COALESCE(?, status),
-                company = COALESCE(?, company),
-                soppa_compliant = COALESCE(?, soppa_compliant),
-                privacy_link = COALESCE(?, privacy_link),
-                product_link = COALESCE(?, product_link),
-                tags = COALESCE(?, tags),
-                notes = COALESCE(?, notes),
-                otherdocs = COALESCE(?, otherdocs)
-                {visibility_clause}
-            WHERE id = ?
-            """.format(visibility_clause=", product_visibility = ?" if product_visibility is not None else ""),
+            UPDATE_APP_SQL if product_visibility is None else UPDATE_APP_WITH_VISIBILITY_SQL,
             tuple([
                 name or None,
                 status or None,
@@ -2528,37 +2967,20 @@ def api_update_delete_app(slug, app_id):
                 otherdocs or None,
             ] + ([product_visibility] if product_visibility is not None else []) + [app_id])
         )
-        conn.commit()
-
-        # Fetch updated state for logging
-        cursor.execute(
-            "SELECT name, company, status, soppa_compliant, privacy_link, product_link, tags, notes, product_visibility, otherdocs FROM apps WHERE id = ?",
-            (app_id,),
-        )
+        # Updated state for logging comes back with the UPDATE itself
         after_row = cursor.fetchone()
+        conn.commit()
         cursor.close()
         conn.close()
-
-        def row_to_dict(row):
-            return {
-                'name': row[0],
-                'company': row[1],
-                'status': row[2],
-                'soppa_compliant': row[3],
-                'privacy_link': normalize_doc_path(row[4]) if row[4] else row[4],
-                'product_link': row[5],
-                'tags': row[6],
-                'notes': row[7],
-                'product_visibility': bool(row[8]) if row[8] is not None else None,
-                'otherdocs': normalize_doc_path(row[9]) if row[9] else row[9],
-            }
+        if not after_row:
+            return jsonify({'error': 'App not found'}), 404
 
         record_app_activity(
             'update',
             app_id=app_id,
             app_name=after_row[0],
             user_email=user.get('email'),
-            details={'before': row_to_dict(before_row), 'after': row_to_dict(after_row)},
+            details={'before': _app_row_to_dict(before_row), 'after': _app_row_to_dict(after_row)},
         )
         return jsonify({'success': True})
     except Exception as exc:
@@ -2569,6 +2991,11 @@ def api_update_delete_app(slug, app_id):
         return jsonify({'error': 'Unable to update app'}), 500
 
 
+# slug -> (cache_versions counter, serialized body) for the api_district_users GET
+DISTRICT_USERS_CACHE = LRUCache(maxsize=64)
+DISTRICT_USERS_CACHE_LOCK = threading.Lock()
+
+
 @app.route('/api/districts/<slug>/users', methods=['GET', 'POST'])
 def api_district_users(slug):
     """List or add users (single-tenant application)."""
@@ -2582,58 +3009,64 @@ def api_district_users(slug):
     # All authenticated users can read; only admins can mutate
     if request.method == 'GET':
         try:
-            ensure_district_users_schema()
-            ensure_users_schema()
             conn = get_db_connection()
             cursor = conn.cursor()
 
-            cursor.execute(
-                "SELECT id FROM districts WHERE slug = ?" if USE_SQLITE else "SELECT id FROM districts WHERE slug = %s",
-                (slug,)
-            )
-            row = cursor.fetchone()
-            if not row:
+            # Same versioned-body scheme as api_admin_apps, one entry per slug
+            version = get_cache_version(cursor, 'district_users')
+            with DISTRICT_USERS_CACHE_LOCK:
+                cached_version, cached_body = DISTRICT_USERS_CACHE.get(slug, (None, None))
+            if version is not None and version == cached_version:
                 cursor.close()
                 conn.close()
-                return jsonify({'users': []})
+                return Response(cached_body, mimetype='application/json')
 
-            cursor.execute(
-                """
-                SELECT du.email,
-                       COALESCE(du.name, u.name, '') AS name,
-                       du.role,
-                       COALESCE(du.created_at, u.created_at) AS created_at
-                FROM district_users du
-                JOIN districts d ON d.id = du.district_id
-                LEFT JOIN users u ON u.email = du.email
-                WHERE d.slug = ?
-                ORDER BY LOWER(du.email)
-                """ if USE_SQLITE else """
-                SELECT du.email,
-                       COALESCE(du.name, u.name, '') AS name,
-                       du.role,
-                       COALESCE(du.created_at, u.created_at) AS created_at
-                FROM district_users du
-                JOIN districts d ON d.id = du.district_id
-                LEFT JOIN users u ON u.email = du.email
-                WHERE d.slug = %s
-                ORDER BY LOWER(du.email)
-                """,
-                (slug,)
-            )
-            rows = cursor.fetchall()
-            users = []
-            for r in rows:
-                users.append({
-                    'email': r[0],
-                    'name': r[1] or '',
-                    'role': r[2] or 'staff',
-                    'created_at': r[3] if r[3] else '',
-                })
+            # The database builds the whole response body; an unknown slug simply
+            # matches no rows, so no separate district lookup is needed
+            if USE_SQLITE:
+                cursor.execute(
+                    """
+                    SELECT json_object('users', json_group_array(json_object(
+                               'email', email, 'name', name, 'role', role, 'created_at', created_at
+                           )))
+                    FROM (
+                        SELECT du.email,
+                               COALESCE(du.name, u.name, '') AS name,
+                               COALESCE(du.role, 'staff') AS role,
+                               COALESCE(du.created_at, u.created_at, '') AS created_at
+                        FROM district_users du
+                        JOIN districts d ON d.id = du.district_id
+                        LEFT JOIN users u ON u.email = du.email
+                        WHERE d.slug = ?
+                        ORDER BY LOWER(du.email)
+                    )
+                    """,
+                    (slug,)
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT json_build_object('users', COALESCE(json_agg(json_build_object(
+                               'email', du.email,
+                               'name', COALESCE(du.name, u.name, ''),
+                               'role', COALESCE(du.role, 'staff'),
+                               'created_at', COALESCE(du.created_at::text, u.created_at::text, '')
+                           ) ORDER BY LOWER(du.email)), '[]'::json))::text
+                    FROM district_users du
+                    JOIN districts d ON d.id = du.district_id
+                    LEFT JOIN users u ON u.email = du.email
+                    WHERE d.slug = %s
+                    """,
+                    (slug,)
+                )
+            body = cursor.fetchone()[0]
 
             cursor.close()
             conn.close()
-            return jsonify({'users': users})
+            if version is not None:
+                with DISTRICT_USERS_CACHE_LOCK:
+                    DISTRICT_USERS_CACHE[slug] = (version, body)
+            return Response(body, mimetype='application/json')
         except Exception as exc:
             app.logger.error('Failed to load district users: %s', exc)
             return jsonify({'error': 'Unable to load users'}), 500
@@ -2653,67 +3086,46 @@ def api_district_users(slug):
         return jsonify({'error': 'Role must be admin or staff'}), 400
 
     try:
-        ensure_districts_schema()
-        ensure_district_users_schema()
-        ensure_users_schema()
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute(
-            "SELECT id FROM districts WHERE slug = ?" if USE_SQLITE else "SELECT id FROM districts WHERE slug = %s",
-            (slug,)
-        )
-        row = cursor.fetchone()
-        if not row:
+        district_id = get_district_id(cursor, slug)
+        if district_id is None:
             cursor.close()
             conn.close()
             return jsonify({'error': 'District not found'}), 404
-        district_id = row[0]
 
-        # Ensure user record exists with a placeholder password
+        # Ensure user record exists, without a usable password
         cursor.execute(
-            "SELECT id FROM users WHERE email = ?" if USE_SQLITE else "SELECT id FROM users WHERE email = %s",
+            "SELECT id FROM users WHERE email = %s",
             (invite_email,)
         )
         user_row = cursor.fetchone()
         if not user_row:
-            placeholder_pw = generate_password_hash(secrets.token_urlsafe(12))
+            # Invited users sign in via SSO; login rejects the marker up front (same as
+            # SSO-created accounts), so there's no need to pay for hashing a random password
             cursor.execute(
-                "INSERT INTO users (email, name, password_hash) VALUES (?, ?, ?)" if USE_SQLITE else
                 "INSERT INTO users (email, name, password_hash) VALUES (%s, %s, %s)",
-                (invite_email, invite_name, placeholder_pw),
+                (invite_email, invite_name, UNUSABLE_PASSWORD_HASH),
             )
 
         # Upsert into district_users
-        if USE_SQLITE:
-            cursor.execute(
-                """
-                INSERT INTO district_users (district_id, email, role, name)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(district_id, email) DO UPDATE SET role=excluded.role, name=excluded.name
-                """,
-                (district_id, invite_email, invite_role, invite_name),
-            )
-        else:
-            cursor.execute(
-                """
-                INSERT INTO district_users (district_id, email, role, name)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (district_id, email) DO UPDATE SET role=EXCLUDED.role, name=EXCLUDED.name
-                """,
-                (district_id, invite_email, invite_role, invite_name),
-            )
+        cursor.execute(
+            """
+            INSERT INTO district_users (district_id, email, role, name)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (district_id, email) DO UPDATE SET role=excluded.role, name=excluded.name
+            """,
+            (district_id, invite_email, invite_role, invite_name),
+        )
 
         conn.commit()
+        invalidate_user_role(invite_email)
         cursor.close()
         conn.close()
         return jsonify({'success': True})
     except Exception as exc:
-        if 'conn' in locals():
-            try:
-                conn.rollback()
-            except Exception:
-                pass
+        # reset_db_connection rolls back the pooled connection at teardown
         app.logger.error('Failed to add district user: %s', exc)
         return jsonify({'error': 'Unable to add user'}), 500
 
@@ -2728,23 +3140,17 @@ def upload_district_logo(slug):
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
         
-    if file and allowed_file(file.filename):
-        filename = secure_filename(f"logo_{slug}_{uuid.uuid4().hex[:8]}.{file.filename.rsplit('.', 1)[1].lower()}")
-        
-        # Ensure directory exists
-        upload_path = os.path.join(app.root_path, 'static', 'global_apps') # Reusing existing volume
-        os.makedirs(upload_path, exist_ok=True)
+    ext = os.path.splitext(file.filename)[1][1:].lower()
+    if ext in ALLOWED_EXTENSIONS:
+        filename = secure_filename(f"logo_{slug}_{secrets.token_urlsafe(6)}.{ext}")
         
-        file.save(os.path.join(upload_path, filename))
+        file.save(os.path.join(GLOBAL_APPS_DIR, filename), buffer_size=UPLOAD_COPY_BUFFER_SIZE)
         logo_url = f"/static/global_apps/{filename}"
         
         # Update DB
         conn = get_db_connection()
         cursor = conn.cursor()
-        if USE_SQLITE:
-            cursor.execute("UPDATE districts SET logo_url = ? WHERE slug = ?", (logo_url, slug))
-        else:
-            cursor.execute("UPDATE districts SET logo_url = %s WHERE slug = %s", (logo_url, slug))
+        cursor.execute("UPDATE districts SET logo_url = %s WHERE slug = %s", (logo_url, slug))
         conn.commit()
         cursor.close()
         conn.close()
@@ -2755,7 +3161,6 @@ def upload_district_logo(slug):
 
 
 if __name__ == '__main__':
-    init_db()  # Initialize database schema
     host = os.getenv('HOST', '127.0.0.1')
     port = int(os.getenv('PORT', os.getenv('FLASK_RUN_PORT', '5000')))
     app.run(host=host, port=port, debug=True)
@@ -13,4 +13,4 @@ except Exception as e:
 EOF
 
 # Start gunicorn
-exec gunicorn -w 4 -b 0.0.0.0:5000 app:app
+exec gunicorn -w 4 --worker-class gthread --threads 8 -b 0.0.0.0:5000 app:app
@@ -1,10 +1,5 @@
 import multiprocessing
-
-workers = multiprocessing.cpu_count() * 2 + 1
-bind = 'unix:lpc.sock'
-umask = 0o007
-reload = True
-import multiprocessing
+import os
 
 # Gunicorn server binding
 bind = "127.0.0.1:5000"
@@ -12,17 +7,30 @@ bind = "127.0.0.1:5000"
 # Number of worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
 
-# Optional: allow Gunicorn to reload on code changes (useful during development)
-reload = True
+# Threaded workers: handlers mostly wait on SQLite, disk and outbound HTTP (OAuth,
+# image proxy), so each process overlaps several requests. Every thread keeps its
+# own pooled SQLite connection.
+worker_class = "gthread"
+threads = 8
+worker_connections = 1000
+keepalive = 5
+
+# Development only: restart workers on code changes (GUNICORN_RELOAD=1)
+reload = os.getenv("GUNICORN_RELOAD", "0") == "1"
 
-# Optional: control file permissions (not needed when using TCP bind)
-# umask = 0o007
+# Import the app (and run init_db) once in the master; workers fork from it and
+# share the loaded modules copy-on-write. Reloading needs a fresh import per worker.
+preload_app = not reload
+
+# Recycle workers periodically to cap slow memory growth; jitter avoids all
+# workers restarting at once
+max_requests = 1000
+max_requests_jitter = 100
+
+# File permissions for sockets and files created by workers (uploads)
+umask = 0o007
 
 # Logging
 accesslog = "-"   # Logs to stdout
 errorlog = "-"    # Logs to stderr
 loglevel = "info"
-
-#logging
-accesslog = '-'
-errorlog = '-'
@@ -1,16 +1,21 @@
-from functools import wraps
+from functools import lru_cache, wraps
+import logging
 import os
 from flask import redirect, url_for, session, request, current_app
 
+# Used when check_domain is called without an explicit allowlist
+DEFAULT_ALLOWED_DOMAINS = frozenset({'sd25.org'})
+
+@lru_cache(maxsize=1)
 def get_google_auth_config():
-    """Return Google OAuth2 configuration."""
+    """Return Google OAuth2 configuration (read from the environment once; treat as read-only)."""
     return {
         'client_id': os.getenv('GOOGLE_CLIENT_ID'),
         'client_secret': os.getenv('GOOGLE_CLIENT_SECRET'),
         'authorization_base_url': 'https://accounts.google.com/o/oauth2/auth',
         'token_url': 'https://oauth2.googleapis.com/token',
         'userinfo_url': 'https://www.googleapis.com/oauth2/v1/userinfo',
-        'scope': ['openid', 'email', 'profile']
+        'scope': ('openid', 'email', 'profile')
     }
 
 def login_required(f):
@@ -20,25 +25,28 @@ def login_required(f):
         if 'user' not in session:
             current_app.logger.debug('User not in session, redirecting to login')
             return redirect(url_for('login', next=request.url))
-        current_app.logger.debug(f'User {session.get("user", {}).get("email")} is authenticated')
+        logger = current_app.logger
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('User %s is authenticated', session['user'].get('email'))
         return f(*args, **kwargs)
     return decorated_function
 
 def check_domain(email, allowed_domains=None):
     """Check if the email domain is in the allowed list."""
     if allowed_domains is None:
-        allowed_domains = ['sd25.org']
+        allowed_domains = DEFAULT_ALLOWED_DOMAINS
         
-    if not email or '@' not in email:
-        current_app.logger.warning(f'Invalid email format: {email}')
+    _, at, domain = (email or '').rpartition('@')
+    if not at:
+        current_app.logger.warning('Invalid email format: %s', email)
         return False
         
-    domain = email.split('@')[1].lower()
+    domain = domain.lower()
     is_allowed = domain in allowed_domains
     
     if not is_allowed:
-        current_app.logger.warning(f'Access denied for domain: {domain}')
+        current_app.logger.warning('Access denied for domain: %s', domain)
     else:
-        current_app.logger.info(f'Access granted for domain: {domain}')
+        current_app.logger.info('Access granted for domain: %s', domain)
         
     return is_allowed